@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from item_bank import ItemBank
+from llm_adapter import llm_generate_questions
+from test_generator import LEVEL_CONFIG
+
+OBJECTIVE_SECTIONS = ["reading", "vocabulary", "conversation", "grammar"]
+
+
+class _RateLimiter:
+    """Spaces calls so no more than `per_minute` start in any rolling minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, stop: threading.Event) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        delay = start - time.monotonic()
+        return not stop.wait(delay) if delay > 0 else not stop.is_set()
+
+
+class BankReplenisher:
+    """
+    Keeps an ItemBank stocked ahead of demand using `llm_generate_questions`.
+
+    Demand per level/section is `LEVEL_CONFIG` question count x `forms_ahead`. Refills run only when
+    the bank has been idle (no draws) for `idle_seconds`, with at most `concurrency` LLM requests
+    in flight and `requests_per_minute` started per minute, so interactive generation keeps priority.
+    """
+
+    def __init__(
+        self,
+        bank: ItemBank,
+        provider: str = "openai",
+        model: Optional[str] = None,
+        levels: Optional[List[str]] = None,
+        forms_ahead: int = 5,
+        batch_size: int = 10,
+        concurrency: int = 2,
+        requests_per_minute: float = 30,
+        idle_seconds: float = 5.0,
+        max_uses: Optional[int] = None,
+        context: Optional[str] = None,
+    ) -> None:
+        self.bank = bank
+        self.provider = provider
+        self.model = model
+        self.levels = levels or list(LEVEL_CONFIG)
+        self.forms_ahead = forms_ahead
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.idle_seconds = idle_seconds
+        self.max_uses = max_uses
+        self.context = context
+        self.added = 0
+        self.errors: List[str] = []
+        self._limiter = _RateLimiter(requests_per_minute)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def targets(self) -> Dict[Tuple[str, str], int]:
+        return {(level, section): LEVEL_CONFIG[level][section] * self.forms_ahead for level in self.levels for section in OBJECTIVE_SECTIONS}
+
+    def deficits(self) -> List[Tuple[str, str, int]]:
+        """(level, section, missing items), most depleted relative to demand first."""
+        stock = self.bank.stock(max_uses=self.max_uses)
+        missing = []
+        for (level, section), target in self.targets().items():
+            gap = target - stock.get((level, section), 0)
+            if gap > 0:
+                missing.append((level, section, gap, gap / target))
+        missing.sort(key=lambda row: row[3], reverse=True)
+        return [(level, section, gap) for level, section, gap, _ in missing]
+
+    def is_idle(self) -> bool:
+        return time.time() - self.bank.last_draw >= self.idle_seconds
+
+    def _should_skip(self, only_when_idle: bool) -> bool:
+        return self._stop.is_set() or (only_when_idle and not self.is_idle())
+
+    def _refill(self, level: str, section: str, count: int, only_when_idle: bool = False) -> int:
+        # Checked before and after the rate-limit wait: a draw during the wait drops the batch.
+        if self._should_skip(only_when_idle) or not self._limiter.wait(self._stop) or self._should_skip(only_when_idle):
+            return 0
+        try:
+            # Skip the response cache: a cached completion would only return items the bank already has.
+            items = llm_generate_questions(self.provider, level, section, count, model=self.model, context=self.context, use_cache=False)
+        except Exception as exc:
+            self.errors.append(f"{level}/{section}: {exc}")
+            return 0
+        return self.bank.add_items(level, section, items[:count], source=f"replenish:{self.provider}")
+
+    def run_once(self, only_when_idle: bool = False) -> int:
+        """
+        Request every deficit in batches of at most `batch_size` items (several batches for a large gap);
+        returns the number of new items stored. With only_when_idle=True each batch re-checks that the bank
+        is still idle and the replenisher is not stopping, and the remaining batches are dropped as soon as
+        either check fails; the next loop pass picks the deficit up again.
+        """
+        jobs = []
+        for level, section, gap in self.deficits():
+            remaining = gap
+            while remaining > 0:
+                jobs.append((level, section, min(self.batch_size, remaining)))
+                remaining -= self.batch_size
+        if not jobs:
+            return 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bank-refill") as pool:
+            added = sum(pool.map(lambda job: self._refill(*job, only_when_idle=only_when_idle), jobs))
+        self.added += added
+        return added
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.is_set():
+            if self.is_idle() and self.deficits():
+                self.run_once(only_when_idle=True)
+            self._stop.wait(interval)
+
+    def start(self, interval: float = 10.0) -> None:
+        """Run the refill loop in a daemon thread, checking every `interval` seconds."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="bank-replenisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if wait and self._thread:
+            self._thread.join()
+        self._thread = None
+
+
+__all__ = ["BankReplenisher"]
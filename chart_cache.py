@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Sequence
+
+# Scores closer together than this draw the same pixels at report resolution.
+DEFAULT_QUANTUM = 1e-4
+
+
+def quantize(values: Sequence[float], quantum: float = DEFAULT_QUANTUM) -> list:
+    return [round(float(v) / quantum) for v in values]
+
+
+def chart_key(name: str, *parts) -> str:
+    """Content address for a chart: a hash of its name and the (quantized) data it draws."""
+    payload = json.dumps([name, *parts], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """
+    Memoizes rendered chart images by content key.
+
+    Keeps an in-memory LRU of up to `max_items` images and, when `disk_dir` is set, a shared
+    on-disk store (one `<key>.png` per chart) trimmed to `disk_budget_bytes` by least-recent use.
+    The disk store is safe to share between worker processes.
+    """
+
+    def __init__(self, max_items: int = 512, disk_dir: str | Path | None = None, disk_budget_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_items = max_items
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_budget_bytes = disk_budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.png"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def put(self, key: str, data: bytes) -> None:
+        if self.max_items > 0:
+            self._remember(key, data)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            except OSError:
+                return
+            self._trim_disk(len(data))
+
+    def _trim_disk(self, added: int) -> None:
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*.png"))
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.disk_budget_bytes:
+                return
+            # Another process may have written or removed files too, so re-scan before evicting.
+            entries = []
+            for p in self.disk_dir.glob("*.png"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in entries:
+                if total <= self.disk_budget_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_DEFAULT_CACHE = ChartCache()
+
+
+def get_chart_cache() -> ChartCache:
+    return _DEFAULT_CACHE
+
+
+def configure_chart_cache(
+    max_items: int = 512, disk_dir: str | Path | None = None, disk_budget_bytes: int = 256 * 1024 * 1024
+) -> ChartCache:
+    """Replace the process-wide chart cache (e.g. to add an on-disk store shared by render workers)."""
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = ChartCache(max_items=max_items, disk_dir=disk_dir, disk_budget_bytes=disk_budget_bytes)
+    return _DEFAULT_CACHE
+
+
+__all__ = ["ChartCache", "chart_key", "quantize", "get_chart_cache", "configure_chart_cache", "DEFAULT_QUANTUM"]
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import math
+
+# Palette shared by the SVG (svg_charts) and reportlab (pdf_charts) renderers; matches the matplotlib charts in html_generator.
+INK = "#111827"
+MUTED = "#4b5563"
+TICK = "#6b7280"
+SPINE = "#d1d5db"
+GRID = "#e5e7eb"
+ACCENT = "#38bdf8"
+MAX_FILL = "#cbd5e1"
+# Ends of the criteria bar gradient (matplotlib's Blues between 0.4 and 0.9).
+CRITERIA_LIGHT = "#94c4df"
+CRITERIA_DARK = "#084a91"
+
+
+def nice_step(upper: float, ticks: int = 5) -> float:
+    """A 1/2/2.5/5 x 10^n axis step giving about `ticks` ticks up to `upper`."""
+    raw = upper / ticks if upper > 0 else 1.0
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for mult in (1, 2, 2.5, 5, 10):
+        if raw <= mult * magnitude:
+            return mult * magnitude
+    return 10 * magnitude
+
+
+def lerp_hex(start: str, end: str, t: float) -> str:
+    """The colour a fraction `t` of the way from `start` to `end` (both "#rrggbb")."""
+    a = [int(start[i : i + 2], 16) for i in (1, 3, 5)]
+    b = [int(end[i : i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * t):02x}" for x, y in zip(a, b))
+
+
+__all__ = ["INK", "MUTED", "TICK", "SPINE", "GRID", "ACCENT", "MAX_FILL", "CRITERIA_LIGHT", "CRITERIA_DARK", "nice_step", "lerp_hex"]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+RenderJob = Tuple  # (result_data, html_path, pdf_path[, write_result_report options])
+
+
+def _warm_worker() -> None:
+    """Import matplotlib/reportlab once per worker process so every report after the first is warm."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    import html_generator  # noqa: F401
+
+    getSampleStyleSheet()
+
+
+def _render_job(job: RenderJob) -> Tuple[str, str, str]:
+    from html_generator import write_result_report
+
+    result, html_path, pdf_path = job[:3]
+    options = job[3] if len(job) > 3 else {}
+    try:
+        write_result_report(result, html_path, pdf_path, **options)
+        return html_path, pdf_path, ""
+    except Exception as exc:
+        return html_path, pdf_path, str(exc)
+
+
+class CohortRenderer:
+    """
+    Render HTML+PDF result reports for a cohort across a pool of worker processes.
+
+    Finished reports are appended to a JSONL manifest; re-running with the same manifest
+    skips every report already recorded (and still on disk), so an interrupted overnight
+    run picks up where it stopped. Jobs that exist only in memory (deferred reports) can be
+    written to a spool file next to the manifest with `spool` and read back by a new process
+    with `spooled`.
+    """
+
+    def __init__(self, workers: Optional[int] = None, manifest_path: str | Path | None = None, max_in_flight: Optional[int] = None) -> None:
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.spool_path = self.manifest_path.with_name(f"{self.manifest_path.stem}.jobs.jsonl") if self.manifest_path else None
+        # Bound the number of submitted-but-unfinished jobs so huge cohorts are not all pickled up front.
+        self.max_in_flight = max_in_flight or self.workers * 4
+
+    def completed(self) -> Set[str]:
+        if not self.manifest_path or not self.manifest_path.exists():
+            return set()
+        done: Set[str] = set()
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                if entry.get("status") == "done":
+                    done.add(entry["html"])
+        return done
+
+    def spool(self, jobs: Iterable[RenderJob]) -> None:
+        """Append job specs (result data, paths, options) to the spool file so another process can render them."""
+        if not self.spool_path:
+            raise ValueError("spooling jobs needs a manifest_path")
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for job in jobs:
+                entry = {"result": job[0], "html": str(job[1]), "pdf": str(job[2]), "options": job[3] if len(job) > 3 else {}}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def spooled(self) -> List[RenderJob]:
+        """Every job ever spooled (one per HTML path, latest spec wins); `render` skips the finished ones."""
+        if not self.spool_path or not self.spool_path.exists():
+            return []
+        jobs: Dict[str, RenderJob] = {}
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                jobs[entry["html"]] = (entry["result"], entry["html"], entry["pdf"], entry.get("options") or {})
+        return list(jobs.values())
+
+    def render(self, jobs: Iterable[RenderJob], on_done: Optional[Callable[[str, str], None]] = None) -> Dict[str, int]:
+        """
+        Render every job not already completed; returns rendered/skipped/failed counts.
+        `on_done(html_path, error)` is called in this process as each report finishes.
+        """
+        done = self.completed()
+        stats = {"rendered": 0, "skipped": 0, "failed": 0}
+        manifest = None
+        if self.manifest_path:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            manifest = open(self.manifest_path, "a", encoding="utf-8")
+
+        def record(html_path: str, pdf_path: str, error: str) -> None:
+            stats["failed" if error else "rendered"] += 1
+            if on_done:
+                on_done(html_path, error)
+            if manifest:
+                entry = {"html": html_path, "pdf": pdf_path, "status": "failed" if error else "done"}
+                if error:
+                    entry["error"] = error
+                manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                manifest.flush()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker) as pool:
+                in_flight = set()
+                for job in jobs:
+                    html_path, pdf_path = str(job[1]), str(job[2])
+                    if html_path in done and Path(html_path).exists() and Path(pdf_path).exists():
+                        stats["skipped"] += 1
+                        continue
+                    in_flight.add(pool.submit(_render_job, (job[0], html_path, pdf_path, *job[3:])))
+                    if len(in_flight) >= self.max_in_flight:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            record(*future.result())
+                for future in wait(in_flight).done:
+                    record(*future.result())
+        finally:
+            if manifest:
+                manifest.close()
+        return stats
+
+
+def render_cohort(
+    jobs: Iterable[RenderJob],
+    workers: Optional[int] = None,
+    manifest_path: str | Path | None = None,
+) -> Dict[str, int]:
+    """Convenience wrapper around `CohortRenderer(...).render(jobs)`."""
+    return CohortRenderer(workers=workers, manifest_path=manifest_path).render(jobs)
+
+
+__all__ = ["CohortRenderer", "render_cohort"]
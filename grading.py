@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from rubric_system import CATEGORY_CRITERIA, CATEGORY_WEIGHTS, LEVEL_THRESHOLDS, WRITING_CRITERIA
+
+OPTION_LABELS: List[str] = ["A", "B", "C", "D"]
+MISSING_CODE = -1
+WRITING_MAX = 16  # 4 criteria * 4
+WRITING_DEFAULT_TOTAL = 8  # midpoint 2/4 * 4
+WRITING_DEFAULT_CRITERION = 2
+WRITING_CRITERION_MAX = 4
+
+
+def option_labels(correct_answers: Dict[str, str]) -> List[str]:
+    """A-D 뒤에 정답표에만 있는 비표준 라벨을 덧붙인 코드 순서를 반환한다."""
+    labels = list(OPTION_LABELS)
+    for value in correct_answers.values():
+        if value not in labels:
+            labels.append(value)
+    return labels
+
+
+def encode_responses(responses, labels: Sequence[str]) -> np.ndarray:
+    """
+    학생 × 문항 응답 행렬을 int8 코드 행렬로 변환한다.
+    문자열 행렬은 라벨 위치로, 정수 행렬은 이미 코드화된 것으로 본다. 미응답/알 수 없는 값은 -1.
+    """
+    arr = np.asarray(responses)
+    if arr.ndim != 2:
+        raise ValueError(f"responses must be a 2-D students x questions matrix, got shape {arr.shape}")
+    if arr.dtype.kind in "iu":
+        # 범위 검사는 원래 dtype에서 한다: int8로 먼저 줄이면 256 같은 값이 0(A)으로 감긴다.
+        valid = (arr >= 0) & (arr < len(labels))
+        return np.where(valid, arr, MISSING_CODE).astype(np.int8, copy=False)
+    codes = np.full(arr.shape, MISSING_CODE, dtype=np.int8)
+    for code, label in enumerate(labels):
+        codes[arr == label] = code
+    return codes
+
+
+def determine_levels(total_scores: np.ndarray) -> np.ndarray:
+    """`determine_level`의 벡터 버전: 총점 배열을 CEFR 레벨 배열로 변환한다."""
+    totals = np.asarray(total_scores, dtype=np.float64)
+    conditions = [totals >= cutoff for _, cutoff in LEVEL_THRESHOLDS]
+    choices = [level for level, _ in LEVEL_THRESHOLDS]
+    return np.select(conditions, choices, default="PRE-A1")
+
+
+def _writing_arrays(n_students: int, llm_feedback: Optional[Sequence[Optional[Dict]]]):
+    totals = np.full(n_students, WRITING_DEFAULT_TOTAL, dtype=np.float64)
+    criteria = {code: np.full(n_students, WRITING_DEFAULT_CRITERION, dtype=np.int64) for code in WRITING_CRITERIA}
+    if llm_feedback is None:
+        return totals, criteria
+    if len(llm_feedback) != n_students:
+        raise ValueError(f"llm_feedback has {len(llm_feedback)} entries for {n_students} students")
+    for row, feedback in enumerate(llm_feedback):
+        if not feedback:
+            continue
+        totals[row] = sum(item.get("score", 0) for item in feedback.values())
+        for code in WRITING_CRITERIA:
+            criteria[code][row] = int(feedback.get(code, {}).get("score", WRITING_DEFAULT_CRITERION))
+    return totals, criteria
+
+
+class AnswerKey:
+    """
+    한 시험지의 정답표를 채점용 배열로 컴파일한 객체.
+    섹션마다 문항 ID 배열과 정답 코드 배열을 미리 만들어 두므로, 같은 시험지로 많은 학생을 채점할 때
+    정답표 dict 스캔이나 접두사 문자열 비교를 반복하지 않는다.
+    """
+
+    def __init__(self, correct_answers: Dict[str, str], level: Optional[str] = None, digest: Optional[str] = None) -> None:
+        self.level = level
+        self.digest = digest
+        self.correct_answers = dict(correct_answers)
+        self.labels = option_labels(self.correct_answers)
+        self.question_ids: List[str] = list(self.correct_answers)
+        self._label_code = {label: code for code, label in enumerate(self.labels)}
+        column = {qid: idx for idx, qid in enumerate(self.question_ids)}
+        # 섹션 분류는 evaluate_test와 같은 접두사 규칙을 따른다.
+        self.section_ids: Dict[str, List[str]] = {
+            cat: [q for q in self.question_ids if q.startswith(prefix)] for cat, (prefix, _) in CATEGORY_CRITERIA.items()
+        }
+        self.sections: Dict[str, Dict[str, np.ndarray]] = {}
+        for cat, qids in self.section_ids.items():
+            self.sections[cat] = {
+                "question_ids": np.array(qids, dtype=str),
+                "codes": np.array([self._label_code[self.correct_answers[q]] for q in qids], dtype=np.int8),
+                "columns": np.array([column[q] for q in qids], dtype=np.intp),
+            }
+
+    @classmethod
+    def from_test_data(cls, data: Dict, digest: Optional[str] = None) -> "AnswerKey":
+        """`generate_test_data`/`export_test_data` 구조의 dict에서 정답표를 컴파일한다."""
+        return cls(data["answer_key"], level=data.get("metadata", {}).get("level"), digest=digest)
+
+    def encode(self, responses) -> np.ndarray:
+        return encode_responses(responses, self.labels)
+
+    def _section_columns(self, question_ids: Optional[Sequence[str]]) -> Dict[str, tuple]:
+        if question_ids is None or list(question_ids) == self.question_ids:
+            return {cat: (sec["columns"], sec["codes"]) for cat, sec in self.sections.items()}
+        column = {qid: idx for idx, qid in enumerate(question_ids)}
+        mapped = {}
+        for cat, qids in self.section_ids.items():
+            # 응답 행렬에 없는 문항은 미응답(오답)으로 처리한다.
+            keep = [i for i, q in enumerate(qids) if q in column]
+            cols = np.array([column[qids[i]] for i in keep], dtype=np.intp)
+            mapped[cat] = (cols, self.sections[cat]["codes"][keep])
+        return mapped
+
+    def score(
+        self,
+        responses,
+        question_ids: Optional[Sequence[str]] = None,
+        llm_feedback: Optional[Sequence[Optional[Dict]]] = None,
+    ) -> Dict:
+        """
+        학생 × 문항 응답 행렬을 한 번에 채점한다.
+        열 순서는 question_ids(생략 시 self.question_ids)를 따른다.
+        `CEFRTestSystem.evaluate_test`와 같은 규칙/연산 순서를 따르므로 학생별 결과가 동일하다.
+        """
+        question_ids = list(question_ids) if question_ids is not None else self.question_ids
+        codes = self.encode(responses)
+        if codes.shape[1] != len(question_ids):
+            raise ValueError(f"responses have {codes.shape[1]} columns for {len(question_ids)} question ids")
+        n_students = codes.shape[0]
+
+        category_scores: Dict[str, np.ndarray] = {}
+        criteria_scores: Dict[str, np.ndarray] = {}
+        total_score = np.zeros(n_students, dtype=np.float64)
+
+        for cat, (cols, key) in self._section_columns(question_ids).items():
+            total = len(self.section_ids[cat])
+            if total:
+                correct = (codes[:, cols] == key).sum(axis=1)
+                proportion = correct / total
+            else:
+                proportion = np.zeros(n_students, dtype=np.float64)
+            score = proportion * CATEGORY_WEIGHTS[cat]
+            category_scores[cat] = score
+            total_score += score
+            crit_value = np.rint(np.clip(proportion, 0.0, 1.0) * 4).astype(np.int64)
+            for code in CATEGORY_CRITERIA[cat][1]:
+                criteria_scores[code] = crit_value
+
+        writing_totals, writing_criteria = _writing_arrays(n_students, llm_feedback)
+        writing_score = writing_totals / WRITING_MAX * CATEGORY_WEIGHTS["writing"]
+        category_scores["writing"] = writing_score
+        total_score += writing_score
+        criteria_scores.update(writing_criteria)
+
+        return {
+            "question_ids": question_ids,
+            "total_score": total_score,
+            "category_scores": category_scores,
+            "category_weights": dict(CATEGORY_WEIGHTS),
+            "criteria_scores": criteria_scores,
+            "determined_level": determine_levels(total_score),
+        }
+
+
+_ANSWER_KEY_CACHE: "OrderedDict[str, AnswerKey]" = OrderedDict()
+_ANSWER_KEY_CACHE_SIZE = 64
+_ANSWER_KEY_LOCK = threading.Lock()
+
+
+def load_answer_key(path: str | Path) -> AnswerKey:
+    """
+    `export_test_data`로 저장한 JSON에서 AnswerKey를 만든다.
+    파일 내용의 SHA-256으로 캐시하므로 같은 시험지는 프로세스당 한 번만 컴파일된다.
+    """
+    payload = Path(path).read_bytes()
+    digest = hashlib.sha256(payload).hexdigest()
+    with _ANSWER_KEY_LOCK:
+        cached = _ANSWER_KEY_CACHE.get(digest)
+        if cached is not None:
+            _ANSWER_KEY_CACHE.move_to_end(digest)
+            return cached
+    key = AnswerKey.from_test_data(json.loads(payload.decode("utf-8")), digest=digest)
+    with _ANSWER_KEY_LOCK:
+        _ANSWER_KEY_CACHE[digest] = key
+        while len(_ANSWER_KEY_CACHE) > _ANSWER_KEY_CACHE_SIZE:
+            _ANSWER_KEY_CACHE.popitem(last=False)
+    return key
+
+
+def score_response_matrix(
+    responses,
+    question_ids: Optional[Sequence[str]],
+    correct_answers: Union[Dict[str, str], AnswerKey],
+    llm_feedback: Optional[Sequence[Optional[Dict]]] = None,
+) -> Dict:
+    """정답표 dict 또는 컴파일된 AnswerKey로 응답 행렬을 채점한다."""
+    key = correct_answers if isinstance(correct_answers, AnswerKey) else AnswerKey(correct_answers)
+    return key.score(responses, question_ids, llm_feedback=llm_feedback)
+
+
+def iter_batch_rows(batch: Dict) -> Iterator[Dict]:
+    """일괄 채점 결과(배열 dict)를 학생별 JSON 직렬화 가능한 dict로 풀어낸다."""
+    categories = list(batch["category_scores"])
+    codes = list(batch["criteria_scores"])
+    totals = batch["total_score"].tolist()
+    levels = batch["determined_level"].tolist()
+    cat_cols = {cat: batch["category_scores"][cat].tolist() for cat in categories}
+    crit_cols = {code: batch["criteria_scores"][code].tolist() for code in codes}
+    names = batch.get("student_names") or [f"student_{i + 1}" for i in range(len(totals))]
+    for row, name in enumerate(names):
+        yield {
+            "student_name": name,
+            "level": batch.get("level"),
+            "total_score": totals[row],
+            "determined_level": levels[row],
+            "category_scores": {cat: cat_cols[cat][row] for cat in categories},
+            "criteria_scores": {code: crit_cols[code][row] for code in codes},
+        }
+
+
+def _writing_score(value, where: str) -> int:
+    """작문 기준 점수 한 칸을 0-4 정수로 검사한다. 잘못된 값은 행/열을 밝힌 ValueError로 알린다."""
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        number = float("nan")
+    if not (number.is_integer() and 0 <= number <= WRITING_CRITERION_MAX):
+        raise ValueError(f"{where}: writing score must be an integer 0-{WRITING_CRITERION_MAX}, got {value!r}")
+    return int(number)
+
+
+def _feedback_from_columns(row: Dict[str, str], where: str) -> Optional[Dict]:
+    feedback = {
+        code: {"score": _writing_score(row[code], f"{where}, column {code}")} for code in WRITING_CRITERIA if row.get(code) not in (None, "")
+    }
+    return feedback or None
+
+
+def _checked_feedback(feedback: Optional[Dict], where: str) -> Optional[Dict]:
+    if not feedback:
+        return None
+    for code, item in feedback.items():
+        if code in WRITING_CRITERIA and isinstance(item, dict) and "score" in item:
+            item["score"] = _writing_score(item["score"], f"{where}, llm_feedback.{code}")
+    return feedback
+
+
+def iter_response_chunks(path: str | Path, question_ids: Sequence[str], chunk_size: int = 10000) -> Iterator[tuple]:
+    """
+    CSV/JSONL 응답 파일을 chunk_size 행씩 읽어 (학생 이름, 응답 행렬, 작문 피드백) 튜플로 내보낸다.
+    CSV: student_name 열 + 문항 ID 열(R1, V1, ...), 선택적으로 W1-W4 작문 점수 열.
+    JSONL: {"student_name": ..., "answers": {qid: label}, "llm_feedback": {...}} 한 줄에 한 명.
+    작문 점수가 0-4 정수가 아니면 파일·행·열을 밝힌 ValueError를 낸다.
+    """
+    path = Path(path)
+    question_ids = list(question_ids)
+    names: List[str] = []
+    rows: List[List[str]] = []
+    feedback: List[Optional[Dict]] = []
+
+    def flush():
+        chunk = (names[:], np.array(rows, dtype=str).reshape(len(rows), len(question_ids)), feedback[:])
+        names.clear()
+        rows.clear()
+        feedback.clear()
+        return chunk
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".jsonl":
+            records = ((line_no, json.loads(line)) for line_no, line in enumerate(f, 1) if line.strip())
+            for idx, (line_no, record) in enumerate(records):
+                answers = record.get("answers", {})
+                names.append(record.get("student_name") or f"student_{idx + 1}")
+                rows.append([answers.get(q) or "" for q in question_ids])
+                feedback.append(_checked_feedback(record.get("llm_feedback"), f"{path} line {line_no}"))
+                if len(rows) >= chunk_size:
+                    yield flush()
+        else:
+            reader = csv.DictReader(f)
+            for idx, record in enumerate(reader):
+                names.append(record.get("student_name") or f"student_{idx + 1}")
+                rows.append([record.get(q) or "" for q in question_ids])
+                feedback.append(_feedback_from_columns(record, f"{path} line {reader.line_num}"))
+                if len(rows) >= chunk_size:
+                    yield flush()
+    if rows:
+        yield flush()
+
+
+def grade_response_file(
+    answer_key: AnswerKey,
+    responses_path: str | Path,
+    output_path: str | Path,
+    level: Optional[str] = None,
+    chunk_size: int = 10000,
+) -> int:
+    """
+    응답 파일을 청크 단위로 읽어 채점하고 결과를 JSONL로 바로 기록한다.
+    메모리 사용량은 파일 크기가 아니라 chunk_size에 비례한다. 채점한 학생 수를 반환한다.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    level = level or answer_key.level
+    graded = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for names, matrix, feedback in iter_response_chunks(responses_path, answer_key.question_ids, chunk_size):
+            llm_feedback = feedback if any(feedback) else None
+            batch = answer_key.score(matrix, llm_feedback=llm_feedback)
+            batch["level"] = level
+            batch["student_names"] = names
+            out.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in iter_batch_rows(batch))
+            out.flush()
+            graded += len(names)
+    return graded
+
+
+__all__ = [
+    "OPTION_LABELS",
+    "MISSING_CODE",
+    "option_labels",
+    "encode_responses",
+    "determine_levels",
+    "AnswerKey",
+    "load_answer_key",
+    "score_response_matrix",
+    "iter_batch_rows",
+    "iter_response_chunks",
+    "grade_response_file",
+]
@@ -17,6 +17,7 @@ def run_gui(default_output: str = "outputs") -> None:
     use_llm_var = tk.BooleanVar(value=False)
     provider_var = tk.StringVar(value="openai")
     model_var = tk.StringVar(value="")
+    deadline_var = tk.StringVar(value="60")
 
     count_vars = {
         "reading": tk.StringVar(value=str(LEVEL_CONFIG[level_var.get()]["reading"])),
@@ -48,6 +49,11 @@ def run_gui(default_output: str = "outputs") -> None:
         except ValueError:
             messagebox.showerror("Invalid input", "Question counts must be integers.")
             return
+        try:
+            deadline = float(deadline_var.get()) if deadline_var.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Invalid input", "Time limit must be a number of seconds.")
+            return
         level = level_var.get()
         system = CEFRTestSystem(output_dir=output_var.get())
         context_val = context_text.get("1.0", "end-1c").strip()
@@ -59,6 +65,7 @@ def run_gui(default_output: str = "outputs") -> None:
                 llm_provider=provider_var.get(),
                 llm_model=model_var.get() or None,
                 context=context_val or None,
+                deadline=deadline,
             )
         except Exception as exc:
             messagebox.showerror("Generation failed", str(exc))
@@ -102,6 +109,9 @@ def run_gui(default_output: str = "outputs") -> None:
     ttk.Label(frm, text="Model (optional)").grid(row=row, column=0, sticky="w")
     ttk.Entry(frm, textvariable=model_var).grid(row=row, column=1, sticky="ew")
     row += 1
+    ttk.Label(frm, text="Time limit (s)").grid(row=row, column=0, sticky="w")
+    ttk.Entry(frm, width=10, textvariable=deadline_var).grid(row=row, column=1, sticky="w")
+    row += 1
 
     ttk.Label(frm, text="Custom Context (optional)").grid(row=row, column=0, sticky="nw", pady=5)
     context_text = tk.Text(frm, height=4, width=40)
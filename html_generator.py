@@ -1,26 +1,32 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
+import os
+import threading
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
-import matplotlib
-
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
 import numpy as np
+from reportlab.graphics.shapes import Drawing
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
+from chart_cache import chart_key, get_chart_cache, quantize
+from pdf_charts import generate_pdf_charts
+from svg_charts import generate_svg_charts
 
-def _base_css() -> str:
+
+SHARED_CSS_NAME = "cefr-report.css"
+CHART_ASSET_DIR = "charts"
+
+
+def _stylesheet() -> str:
     return """
-    <style>
       :root {
         --bg: #0f172a;
         --card: #111827;
@@ -49,14 +55,40 @@ def _base_css() -> str:
       .charts { display: grid; grid-template-columns: repeat(auto-fit, minmax(240px, 1fr)); gap: 12px; }
       .chart { background: rgba(255,255,255,0.03); border: 1px solid #1f2937; border-radius: 12px; padding: 10px; }
       .chart img { width: 100%; display: block; border-radius: 8px; }
+      .chart svg { width: 100%; height: auto; display: block; border-radius: 8px; }
       .stat-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(160px, 1fr)); gap: 10px; }
       .stat { padding: 10px 12px; border-radius: 10px; background: rgba(56,189,248,0.08); border: 1px solid rgba(56,189,248,0.25); }
       .stat .label { color: var(--muted); font-size: 12px; text-transform: uppercase; letter-spacing: 0.04em; }
       .stat .value { font-size: 20px; font-weight: 700; }
-    </style>
     """
 
 
+def _base_css() -> str:
+    return f"""
+    <style>{_stylesheet()}</style>
+    """
+
+
+def _head_css(css_href: str | None = None) -> str:
+    """Inline <style> block, or a <link> to the shared stylesheet written by `write_shared_css`."""
+    if css_href:
+        return f"<link rel='stylesheet' href='{css_href}'>"
+    return _base_css()
+
+
+def write_shared_css(directory: str | Path) -> str:
+    """Write the shared stylesheet into `directory` (once) and return its href relative to that directory."""
+    path = Path(directory) / SHARED_CSS_NAME
+    css = _stylesheet()
+    if not path.exists() or path.read_text(encoding="utf-8") != css:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written beside the target and swapped in, so a concurrent report writer never reads a partial stylesheet.
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(css, encoding="utf-8")
+        os.replace(tmp, path)
+    return SHARED_CSS_NAME
+
+
 def _style_axes(fig, ax):
     fig.patch.set_facecolor("#ffffff")
     ax.set_facecolor("#ffffff")
@@ -68,77 +100,130 @@ def _style_axes(fig, ax):
     ax.title.set_color("#111827")
 
 
-def _fig_to_data_url(fig) -> str:
+def _pyplot():
+    """matplotlib.pyplot on the Agg backend, imported on first use so the SVG chart backend never loads matplotlib."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def _fig_to_png(fig) -> bytes:
     buf = io.BytesIO()
     fig.savefig(buf, format="png", dpi=180, bbox_inches="tight", facecolor=fig.get_facecolor())
-    plt.close(fig)
-    data = base64.b64encode(buf.getvalue()).decode("ascii")
-    return f"data:image/png;base64,{data}"
+    _pyplot().close(fig)
+    return buf.getvalue()
+
 
+class ChartImage:
+    """
+    A rendered chart held once as raw image bytes.
+    The PDF exporter reads the bytes directly; base64 encoding happens only when HTML is written.
+    """
 
-def _category_bar_chart(result: Dict) -> str:
+    __slots__ = ("data", "mime", "href")
+
+    def __init__(self, data: bytes, mime: str = "image/png", href: str | None = None) -> None:
+        self.data = data
+        self.mime = mime
+        self.href = href  # set when the image was also written as an external file
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
+
+    def data_url(self) -> str:
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def _cached_chart(key: str, draw: Callable[[], object]) -> ChartImage:
+    """Return the chart for `key` from the chart cache, drawing it with matplotlib only on a miss."""
+    cache = get_chart_cache()
+    png = cache.get(key)
+    if png is None:
+        png = _fig_to_png(draw())
+        cache.put(key, png)
+    return ChartImage(png)
+
+
+def _category_bar_chart(result: Dict) -> ChartImage:
     labels = list(result["category_scores"].keys())
     scores = [result["category_scores"][k] for k in labels]
     max_scores = [result["category_weights"].get(k, 0) for k in labels]
-    x = np.arange(len(labels))
-    width = 0.38
-    fig, ax = plt.subplots(figsize=(6.2, 3.3))
-    _style_axes(fig, ax)
-    ax.bar(x - width / 2, scores, width, label="Score", color="#38bdf8")
-    ax.bar(x + width / 2, max_scores, width, label="Max", color="#cbd5e1")
-    ax.set_xticks(x)
-    ax.set_xticklabels([k.title() for k in labels], rotation=18, ha="right")
-    ax.set_ylabel("Points")
-    ax.set_title("Category Scores vs Max")
-    ax.legend(facecolor="#ffffff", edgecolor="#d1d5db")
-    ax.grid(axis="y", color="#e5e7eb", linestyle="--", alpha=0.8)
-    return _fig_to_data_url(fig)
-
-
-def _category_radar_chart(result: Dict) -> str:
+
+    def draw():
+        x = np.arange(len(labels))
+        width = 0.38
+        plt = _pyplot()
+        fig, ax = plt.subplots(figsize=(6.2, 3.3))
+        _style_axes(fig, ax)
+        ax.bar(x - width / 2, scores, width, label="Score", color="#38bdf8")
+        ax.bar(x + width / 2, max_scores, width, label="Max", color="#cbd5e1")
+        ax.set_xticks(x)
+        ax.set_xticklabels([k.title() for k in labels], rotation=18, ha="right")
+        ax.set_ylabel("Points")
+        ax.set_title("Category Scores vs Max")
+        ax.legend(facecolor="#ffffff", edgecolor="#d1d5db")
+        ax.grid(axis="y", color="#e5e7eb", linestyle="--", alpha=0.8)
+        return fig
+
+    return _cached_chart(chart_key("categories_bar", labels, quantize(scores), quantize(max_scores)), draw)
+
+
+def _category_radar_chart(result: Dict) -> ChartImage:
     labels = list(result["category_scores"].keys())
     values = [
         (result["category_scores"].get(k, 0) / result["category_weights"].get(k, 1)) if result["category_weights"].get(k) else 0
         for k in labels
     ]
-    labels_cycle = labels + labels[:1]
-    values_cycle = values + values[:1]
-    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
-    angles_cycle = angles + angles[:1]
-    fig, ax = plt.subplots(subplot_kw={"polar": True}, figsize=(5, 5))
-    _style_axes(fig, ax)
-    ax.set_ylim(0, 1)
-    ax.plot(angles_cycle, values_cycle, color="#38bdf8", linewidth=2)
-    ax.fill(angles_cycle, values_cycle, color="#38bdf8", alpha=0.25)
-    ax.set_xticks(angles)
-    ax.set_xticklabels([k.title() for k in labels], color="#111827")
-    ax.set_yticks([0.25, 0.5, 0.75, 1.0])
-    ax.set_yticklabels(["0.25", "0.5", "0.75", "1.0"], color="#6b7280")
-    ax.grid(color="#e5e7eb", linestyle="--", alpha=0.8)
-    ax.set_title("Category Performance (0-1)", pad=14)
-    return _fig_to_data_url(fig)
-
-
-def _criteria_bar_chart(result: Dict) -> str:
+
+    def draw():
+        values_cycle = values + values[:1]
+        angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+        angles_cycle = angles + angles[:1]
+        plt = _pyplot()
+        fig, ax = plt.subplots(subplot_kw={"polar": True}, figsize=(5, 5))
+        _style_axes(fig, ax)
+        ax.set_ylim(0, 1)
+        ax.plot(angles_cycle, values_cycle, color="#38bdf8", linewidth=2)
+        ax.fill(angles_cycle, values_cycle, color="#38bdf8", alpha=0.25)
+        ax.set_xticks(angles)
+        ax.set_xticklabels([k.title() for k in labels], color="#111827")
+        ax.set_yticks([0.25, 0.5, 0.75, 1.0])
+        ax.set_yticklabels(["0.25", "0.5", "0.75", "1.0"], color="#6b7280")
+        ax.grid(color="#e5e7eb", linestyle="--", alpha=0.8)
+        ax.set_title("Category Performance (0-1)", pad=14)
+        return fig
+
+    return _cached_chart(chart_key("categories_radar", labels, quantize(values)), draw)
+
+
+def _criteria_bar_chart(result: Dict) -> ChartImage:
     codes = list(result["criteria_meta"].keys())
     scores = [result["criteria_scores"].get(code, 0) for code in codes]
-    y_pos = np.arange(len(codes))
-    fig, ax = plt.subplots(figsize=(6.4, 6.0))
-    _style_axes(fig, ax)
-    colors = plt.cm.Blues(np.linspace(0.4, 0.9, len(codes)))
-    ax.barh(y_pos, scores, color=colors)
-    ax.set_yticks(y_pos)
-    ax.set_yticklabels(codes, color="#111827")
-    ax.invert_yaxis()
-    ax.set_xlabel("Score (0-4)")
-    ax.set_title("20-Criteria Checklist Scores")
-    ax.set_xlim(0, 4.2)
-    ax.grid(axis="x", color="#e5e7eb", linestyle="--", alpha=0.8)
-    return _fig_to_data_url(fig)
-
-
-def generate_result_charts(result: Dict) -> Dict[str, str]:
-    """Generate base64 chart images for the result report."""
+
+    def draw():
+        y_pos = np.arange(len(codes))
+        plt = _pyplot()
+        fig, ax = plt.subplots(figsize=(6.4, 6.0))
+        _style_axes(fig, ax)
+        colors = plt.cm.Blues(np.linspace(0.4, 0.9, len(codes)))
+        ax.barh(y_pos, scores, color=colors)
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(codes, color="#111827")
+        ax.invert_yaxis()
+        ax.set_xlabel("Score (0-4)")
+        ax.set_title("20-Criteria Checklist Scores")
+        ax.set_xlim(0, 4.2)
+        ax.grid(axis="x", color="#e5e7eb", linestyle="--", alpha=0.8)
+        return fig
+
+    return _cached_chart(chart_key("criteria_bar", codes, quantize(scores)), draw)
+
+
+def generate_result_charts(result: Dict) -> Dict[str, ChartImage]:
+    """Generate the result report charts as raw PNG artifacts shared by the HTML and PDF exporters."""
     try:
         return {
             "categories_bar": _category_bar_chart(result),
@@ -150,12 +235,27 @@ def generate_result_charts(result: Dict) -> Dict[str, str]:
         return {}
 
 
-def _image_from_data_url(data_url: str, max_width: float) -> Image | None:
-    if not data_url:
+def _chart_bytes(chart: ChartImage | str | None) -> bytes | memoryview | None:
+    if not chart:
+        return None
+    if isinstance(chart, ChartImage):
+        return chart.data if chart.mime == "image/png" else None
+    if chart.startswith("data:"):
+        return base64.b64decode(chart.split(",", 1)[-1])
+    return None  # inline SVG cannot be placed by reportlab
+
+
+def _pdf_image(chart: ChartImage | Drawing | str | None, max_width: float) -> Image | Drawing | None:
+    if isinstance(chart, Drawing):
+        scale = max_width / float(chart.width or 1)
+        chart.scale(scale, scale)
+        chart.width, chart.height = chart.width * scale, chart.height * scale
+        return chart
+    img_bytes = _chart_bytes(chart)
+    if img_bytes is None:
         return None
     try:
-        payload = data_url.split(",", 1)[-1]
-        img_bytes = base64.b64decode(payload)
+        # BytesIO shares the immutable bytes buffer until written to, so this does not copy the image.
         buf = io.BytesIO(img_bytes)
         img = Image(buf)
         aspect = img.imageHeight / float(img.imageWidth or 1)
@@ -166,8 +266,10 @@ def _image_from_data_url(data_url: str, max_width: float) -> Image | None:
         return None
 
 
-def export_result_pdf(result: Dict, output_path: str | Path, chart_images: Dict[str, str] | None = None) -> str:
-    """Create a PDF report with charts and return the saved path."""
+def export_result_pdf(
+    result: Dict, output_path: str | Path, chart_images: Dict[str, ChartImage | Drawing | str] | None = None
+) -> str:
+    """Create a PDF report with charts (PNG artifacts or reportlab drawings) and return the saved path."""
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     chart_images = chart_images or generate_result_charts(result)
@@ -235,7 +337,7 @@ def export_result_pdf(result: Dict, output_path: str | Path, chart_images: Dict[
         ("criteria_bar", "20-Criteria Checklist", "Scores for each rubric criterion (0-4 scale)."),
     ]
     for key, title, desc in chart_specs:
-        img = _image_from_data_url(chart_images.get(key, ""), max_width=460)
+        img = _pdf_image(chart_images.get(key), max_width=460)
         if img:
             story.append(Paragraph(title, styles["Heading3"]))
             story.append(img)
@@ -307,13 +409,64 @@ def export_result_pdf(result: Dict, output_path: str | Path, chart_images: Dict[
     return str(output_path)
 
 
-def render_test_paper(test_data: Dict) -> str:
+def write_chart_assets(chart_images: Dict[str, ChartImage | str], directory: str | Path) -> Dict[str, ChartImage | str]:
+    """
+    Write PNG charts as content-addressed files under `directory`/charts and return artifacts that link to them.
+    Identical charts across reports share one file.
+    """
+    asset_dir = Path(directory) / CHART_ASSET_DIR
+    linked: Dict[str, ChartImage | str] = {}
+    for key, chart in chart_images.items():
+        if not isinstance(chart, ChartImage) or chart.mime != "image/png" or not chart:
+            linked[key] = chart
+            continue
+        name = f"{hashlib.sha256(chart.data).hexdigest()[:32]}.png"
+        path = asset_dir / name
+        if not path.exists():
+            asset_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(chart.data)
+            os.replace(tmp, path)
+        linked[key] = ChartImage(chart.data, chart.mime, href=f"{CHART_ASSET_DIR}/{name}")
+    return linked
+
+
+def write_result_report(
+    result: Dict,
+    html_path: str | Path,
+    pdf_path: str | Path,
+    chart_backend: str = "png",
+    asset_mode: str = "inline",
+    chart_files: bool = True,
+) -> Tuple[str, str]:
+    """
+    Render charts once and write both the HTML and PDF result reports.
+    With chart_backend="svg" no matplotlib figure is drawn: the HTML embeds inline SVG charts and the PDF,
+    written afterwards, gets reportlab vector drawings. With "png" both reports share one set of PNG charts.
+    With asset_mode="external" the HTML links a shared stylesheet next to it, and also chart image files
+    unless chart_files=False, which keeps the charts inline.
+    """
+    html_path = Path(html_path)
+    png_charts = None if chart_backend == "svg" else generate_result_charts(result)
+    html_charts = png_charts if png_charts is not None else generate_svg_charts(result)
+    html_path.parent.mkdir(parents=True, exist_ok=True)
+    css_href = None
+    if asset_mode == "external":
+        css_href = write_shared_css(html_path.parent)
+        if chart_files:
+            html_charts = write_chart_assets(html_charts, html_path.parent)
+    html_path.write_text(render_result_report(result, html_charts, css_href=css_href), encoding="utf-8")
+    pdf = export_result_pdf(result, pdf_path, png_charts if png_charts is not None else generate_pdf_charts(result))
+    return str(html_path), pdf
+
+
+def render_test_paper(test_data: Dict, css_href: str | None = None) -> str:
     metadata = test_data["metadata"]
     sections = test_data["sections"]
     html_parts: List[str] = [
         "<!DOCTYPE html><html><head><meta charset='utf-8'>",
         "<title>CEFR Test Paper</title>",
-        _base_css(),
+        _head_css(css_href),
         "</head><body>",
         f"<h1>CEFR Level Test — {metadata['level']}</h1>",
         f"<div class='meta'><div>Duration: {metadata['duration']} minutes</div><div>Generated: {metadata['generated_at']}</div></div>",
@@ -341,7 +494,7 @@ def render_test_paper(test_data: Dict) -> str:
     return "".join(html_parts)
 
 
-def render_answer_key(test_data: Dict) -> str:
+def render_answer_key(test_data: Dict, css_href: str | None = None) -> str:
     metadata = test_data["metadata"]
     answer_key = test_data["answer_key"]
     rows = "".join(
@@ -349,7 +502,7 @@ def render_answer_key(test_data: Dict) -> str:
         for qid, ans in sorted(answer_key.items(), key=lambda kv: (kv[0][0], int(kv[0][1:])))
     )
     html = f"""<!DOCTYPE html>
-    <html><head><meta charset="utf-8"><title>Answer Key {metadata['level']}</title>{_base_css()}</head>
+    <html><head><meta charset="utf-8"><title>Answer Key {metadata['level']}</title>{_head_css(css_href)}</head>
     <body>
       <h1>Answer Key — {metadata['level']}</h1>
       <div class='meta'><div>Generated: {metadata['generated_at']}</div><div>Total Questions: {metadata['total_questions']}</div></div>
@@ -364,9 +517,28 @@ def render_answer_key(test_data: Dict) -> str:
     return html
 
 
-def render_result_report(result: Dict, chart_images: Dict[str, str] | None = None) -> str:
+def _chart_markup(chart: ChartImage | str | None, alt: str) -> str:
+    if isinstance(chart, ChartImage):
+        return f'<img src="{chart.href or chart.data_url()}" alt="{alt}">'
+    chart = chart or ""
+    if chart.lstrip().startswith("<svg"):
+        return chart
+    return f'<img src="{chart}" alt="{alt}">'
+
+
+def render_result_report(
+    result: Dict,
+    chart_images: Dict[str, ChartImage | str] | None = None,
+    chart_backend: str = "png",
+    css_href: str | None = None,
+) -> str:
+    """
+    Render the HTML result report. chart_images may hold ChartImage artifacts, data URLs or inline SVG strings;
+    when omitted they are generated with the chosen chart_backend ("png" via matplotlib or "svg").
+    """
     meta = result["metadata"]
-    chart_images = chart_images or generate_result_charts(result)
+    if not chart_images:
+        chart_images = generate_svg_charts(result) if chart_backend == "svg" else generate_result_charts(result)
     total_possible = 80.0
     overall_pct = (result["total_score"] / total_possible * 100) if total_possible else 0
     writing_score = result["category_scores"].get("writing", 0.0)
@@ -393,7 +565,7 @@ def render_result_report(result: Dict, chart_images: Dict[str, str] | None = Non
     recs = "".join(f"<div class='list-item'>{item}</div>" for item in result.get("recommendations", []))
 
     html = f"""<!DOCTYPE html>
-    <html><head><meta charset="utf-8"><title>Result Report</title>{_base_css()}</head>
+    <html><head><meta charset="utf-8"><title>Result Report</title>{_head_css(css_href)}</head>
     <body>
       <h1>Result Report — {result['student_name']}</h1>
       <div class='meta'>
@@ -422,15 +594,15 @@ def render_result_report(result: Dict, chart_images: Dict[str, str] | None = Non
         <h2>Visual Summary</h2>
         <div class='charts'>
           <div class='chart'>
-            <img src="{chart_images.get('categories_bar', '')}" alt="Category bar chart">
+            {_chart_markup(chart_images.get('categories_bar'), 'Category bar chart')}
             <div class='muted'>Category scores vs maximum points</div>
           </div>
           <div class='chart'>
-            <img src="{chart_images.get('categories_radar', '')}" alt="Category radar chart">
+            {_chart_markup(chart_images.get('categories_radar'), 'Category radar chart')}
             <div class='muted'>Normalized performance (0-1 scale)</div>
           </div>
           <div class='chart'>
-            <img src="{chart_images.get('criteria_bar', '')}" alt="Criteria bar chart">
+            {_chart_markup(chart_images.get('criteria_bar'), 'Criteria bar chart')}
             <div class='muted'>20-criteria checklist scores</div>
           </div>
         </div>
@@ -471,4 +643,14 @@ def render_result_report(result: Dict, chart_images: Dict[str, str] | None = Non
     return html
 
 
-__all__ = ["render_test_paper", "render_answer_key", "render_result_report", "generate_result_charts", "export_result_pdf"]
+__all__ = [
+    "render_test_paper",
+    "render_answer_key",
+    "render_result_report",
+    "generate_result_charts",
+    "export_result_pdf",
+    "write_result_report",
+    "ChartImage",
+    "write_shared_css",
+    "write_chart_assets",
+]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_BANK_PATH = "item_bank.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    level TEXT NOT NULL,
+    section TEXT NOT NULL,
+    criterion TEXT NOT NULL,
+    text TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT NOT NULL,
+    created REAL NOT NULL,
+    used_count INTEGER NOT NULL DEFAULT 0,
+    last_used REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_items_fingerprint ON items (level, section, fingerprint);
+CREATE INDEX IF NOT EXISTS idx_items_level_section_criterion ON items (level, section, criterion);
+CREATE INDEX IF NOT EXISTS idx_items_level_section_used ON items (level, section, used_count);
+"""
+
+
+def item_fingerprint(item: Dict) -> str:
+    """Stable hash of an item's stem and options, used to keep the bank free of exact duplicates."""
+    options = [(opt.get("label"), " ".join(str(opt.get("text", "")).split())) for opt in item.get("options", [])]
+    payload = json.dumps([" ".join(str(item.get("text", "")).split()).lower(), options], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ItemBank:
+    """
+    SQLite store of reusable test items, indexed by level, section and rubric criterion.
+
+    `generate_test_data` draws from it first and only generates the shortfall. Sampling prefers
+    the least-used items and spreads picks across a section's rubric criteria.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_BANK_PATH) -> None:
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.last_draw = 0.0  # time of the latest sample(); background refills wait for quiet periods
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if str(path) != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add_items(self, level: str, section: str, items: Iterable[Dict], source: str = "llm", used: bool = False) -> int:
+        """
+        Store items (question dicts as produced by llm_generate_questions); returns how many were new.
+        used=True records them as already placed on one form. The rubric criterion comes from the item
+        (the model is asked for it and llm_adapter validates it); items without one are stored with an
+        empty criterion, meaning unknown, and sampling treats them as one more group.
+        """
+        now = time.time()
+        rows = []
+        for item in items:
+            criterion = item.get("criterion") or ""
+            rows.append(
+                (
+                    level,
+                    section,
+                    criterion,
+                    item.get("text", ""),
+                    json.dumps(item.get("options", []), ensure_ascii=False),
+                    item.get("correct", "A"),
+                    source,
+                    item_fingerprint(item),
+                    now,
+                    1 if used else 0,
+                    now if used else None,
+                )
+            )
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items"
+                " (level, section, criterion, text, options, correct, source, fingerprint, created, used_count, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def count(self, level: str, section: str, max_uses: Optional[int] = None) -> int:
+        sql = "SELECT COUNT(*) FROM items WHERE level = ? AND section = ?"
+        params: List = [level, section]
+        if max_uses is not None:
+            sql += " AND used_count < ?"
+            params.append(max_uses)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def stock(self, max_uses: Optional[int] = None) -> Dict[Tuple[str, str], int]:
+        """Available items per (level, section)."""
+        sql = "SELECT level, section, COUNT(*) FROM items"
+        params: List = []
+        if max_uses is not None:
+            sql += " WHERE used_count < ?"
+            params.append(max_uses)
+        sql += " GROUP BY level, section"
+        with self._lock:
+            return {(lvl, sec): n for lvl, sec, n in self._conn.execute(sql, params)}
+
+    def sample(
+        self,
+        level: str,
+        section: str,
+        count: int,
+        exclude_ids: Iterable[int] = (),
+        exclude_fingerprints: Iterable[str] = (),
+        max_uses: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+        mark_used: bool = True,
+    ) -> List[Dict]:
+        """
+        Draw up to `count` items for one section.
+        Items in `exclude_ids`/`exclude_fingerprints` (e.g. used on a sibling form) and items already used
+        `max_uses` times are skipped. Returned dicts carry their bank id as "item_id".
+        """
+        if count <= 0:
+            return []
+        self.last_draw = time.time()
+        rng = rng or random.Random()
+        excluded_ids = set(exclude_ids)
+        excluded_fp = set(exclude_fingerprints)
+        sql = "SELECT * FROM items WHERE level = ? AND section = ?"
+        params: List = [level, section]
+        if max_uses is not None:
+            sql += " AND used_count < ?"
+            params.append(max_uses)
+        # Least-used first; only a bounded candidate pool is pulled into Python.
+        sql += " ORDER BY used_count, random() LIMIT ?"
+        params.append(count * 4 + len(excluded_ids) + len(excluded_fp))
+        with self._lock:
+            rows = [r for r in self._conn.execute(sql, params) if r["id"] not in excluded_ids and r["fingerprint"] not in excluded_fp]
+
+        by_criterion: Dict[str, List[sqlite3.Row]] = {}
+        for row in rows:
+            by_criterion.setdefault(row["criterion"], []).append(row)
+        picked: List[sqlite3.Row] = []
+        criteria = sorted(by_criterion)
+        rng.shuffle(criteria)
+        while len(picked) < count and any(by_criterion.values()):
+            for criterion in criteria:
+                if by_criterion[criterion] and len(picked) < count:
+                    picked.append(by_criterion[criterion].pop(0))
+
+        if mark_used and picked:
+            self.mark_used([row["id"] for row in picked])
+        return [
+            {
+                "item_id": row["id"],
+                "text": row["text"],
+                "options": json.loads(row["options"]),
+                "correct": row["correct"],
+                "criterion": row["criterion"],
+                "section": section,
+                "fingerprint": row["fingerprint"],
+            }
+            for row in picked
+        ]
+
+    def mark_used(self, item_ids: Iterable[int]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE items SET used_count = used_count + 1, last_used = ? WHERE id = ?",
+                [(now, item_id) for item_id in item_ids],
+            )
+
+
+__all__ = ["ItemBank", "item_fingerprint", "DEFAULT_BANK_PATH"]
@@ -1,24 +1,145 @@
 from __future__ import annotations
 
+import itertools
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
+from llm_cache import get_llm_cache
+from llm_circuit import CircuitOpenError, get_breaker
+from llm_replay import ReplayClient, get_recorder
+from llm_scheduler import AdaptiveLimiter, RetryPolicy, classify_error
+from llm_telemetry import get_telemetry
+from rubric_system import CATEGORY_CRITERIA
+
 load_dotenv()
 
 LLM_DEFAULTS = {
     "openai": {"model": "gpt-4o-mini"},
     "anthropic": {"model": "claude-3-5-sonnet-20241022"},
     "gemini": {"model": "gemini-2.5-pro"},
+    # Offline stand-in that replays recorded completions (see llm_replay); for tests and benchmarks.
+    "replay": {"model": "replay"},
+}
+
+
+# Starting in-flight request limit per provider, shared by every thread in the process.
+# The limit then adapts (AIMD): it grows while requests succeed, up to LLM_MAX_CONCURRENCY,
+# and halves when the provider throttles (429, overload, timeout).
+LLM_CONCURRENCY = {
+    "openai": 4,
+    "anthropic": 4,
+    "gemini": 2,
+    "replay": 8,
+}
+
+LLM_MAX_CONCURRENCY = {
+    "openai": 16,
+    "anthropic": 16,
+    "gemini": 8,
+    "replay": 64,
+}
+
+# Retries for throttled/transient provider errors: exponential backoff with jitter, honouring Retry-After.
+RETRY_POLICY = RetryPolicy(max_retries=4, base_delay=0.5, max_delay=30.0)
+
+# Seconds one provider request may take when the caller gave no deadline, so a hung connection cannot block forever.
+LLM_REQUEST_TIMEOUT = 120.0
+
+# Hedged requests (opt-in): the backup fires once the primary has run longer than this quantile of its
+# recent call times, or after HEDGE_DEFAULT_DELAY seconds while there are no samples yet.
+HEDGE_QUANTILE = 0.9
+HEDGE_DEFAULT_DELAY = 5.0
+
+_API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "gemini": "GEMINI_API_KEY",
 }
 
+_provider_slots: Dict[str, AdaptiveLimiter] = {}
+_provider_slots_lock = threading.Lock()
+
 
 class LLMNotConfigured(RuntimeError):
     pass
 
 
+class LLMDeadlinePassed(RuntimeError):
+    """The caller's deadline passed before the provider answered."""
+
+
+def _expires(deadline: Optional[float]) -> Optional[float]:
+    """Monotonic expiry time for a deadline given in seconds from now."""
+    return time.monotonic() + deadline if deadline is not None else None
+
+
+def _cancelled(call: Dict) -> bool:
+    """True once a hedged request answered first and this call should stop."""
+    return call["cancel"] is not None and call["cancel"].is_set()
+
+
+def _remaining(expires: Optional[float], call: Optional[Dict] = None) -> Optional[float]:
+    """
+    Seconds left before `expires` (None without a deadline); raises LLMDeadlinePassed when none are left
+    or when the call was cancelled because a hedged request answered first.
+    """
+    if call is not None and _cancelled(call):
+        raise LLMDeadlinePassed("cancelled: another request answered first")
+    if expires is None:
+        return None
+    remaining = expires - time.monotonic()
+    if remaining <= 0:
+        raise LLMDeadlinePassed("deadline exceeded")
+    return remaining
+
+
+def set_provider_concurrency(provider: str, limit: int, max_limit: Optional[int] = None) -> None:
+    """
+    Reset the per-provider in-flight request limit (applies to requests started afterwards).
+    The limit adapts between 1 and max_limit (default LLM_MAX_CONCURRENCY); pass max_limit=limit to pin it.
+    """
+    if limit < 1:
+        raise ValueError("concurrency limit must be >= 1")
+    provider = provider.lower()
+    with _provider_slots_lock:
+        LLM_CONCURRENCY[provider] = limit
+        if max_limit is not None:
+            LLM_MAX_CONCURRENCY[provider] = max_limit
+        _provider_slots[provider] = AdaptiveLimiter(limit, max_limit=LLM_MAX_CONCURRENCY.get(provider))
+
+
+def _slots(provider: str) -> AdaptiveLimiter:
+    with _provider_slots_lock:
+        slots = _provider_slots.get(provider)
+        if slots is None:
+            slots = AdaptiveLimiter(LLM_CONCURRENCY.get(provider, 1), max_limit=LLM_MAX_CONCURRENCY.get(provider))
+            _provider_slots[provider] = slots
+        return slots
+
+
+def provider_concurrency(provider: str) -> int:
+    """Current adaptive in-flight limit for a provider."""
+    return _slots(provider.lower()).limit
+
+
+def _retry_delay(exc: Exception, attempt: int, call: Dict, expires: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait before retrying after `exc`, or None if it should be raised (including when the retry would miss `expires`)."""
+    kind, retry_after = classify_error(exc)
+    if kind == "fatal" or attempt >= RETRY_POLICY.max_retries:
+        return None
+    delay = RETRY_POLICY.delay(attempt, retry_after)
+    if expires is not None and time.monotonic() + delay >= expires:
+        return None
+    call["retries"] += 1
+    return delay
+
+
 def _load_client(provider: str):
     provider = provider.lower()
     if provider == "openai":
@@ -53,16 +174,68 @@ def _load_client(provider: str):
             raise LLMNotConfigured("GEMINI_API_KEY not set")
         genai.configure(api_key=api_key)
         return genai
+    if provider == "replay":
+        return ReplayClient.from_env()
     raise ValueError(f"Unsupported provider: {provider}")
 
 
+# Provider clients are built once per (provider, API key) and shared by every thread,
+# so the SDK's HTTP connection pool stays warm across sections, tests and batch runs.
+_clients: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider: str):
+    """Return the process-wide client for a provider, building it on first use."""
+    provider = provider.lower()
+    key = (provider, os.getenv(_API_KEY_ENV.get(provider, ""), ""))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _load_client(provider)
+            _clients[key] = client
+    return client
+
+
+def warm_up(providers: Optional[List[str]] = None) -> Dict[str, str]:
+    """Build clients ahead of the first request; returns "ok" or the error message per provider."""
+    status: Dict[str, str] = {}
+    for provider in providers or list(LLM_DEFAULTS):
+        try:
+            get_client(provider)
+            status[provider] = "ok"
+        except (LLMNotConfigured, ValueError) as exc:
+            status[provider] = str(exc)
+    return status
+
+
+def reset_clients() -> None:
+    """Drop cached clients (e.g. after changing SDK settings)."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _section_criteria(section: str) -> List[str]:
+    """Rubric codes an item of `section` may target; empty for sections without objective criteria."""
+    return CATEGORY_CRITERIA.get(section, ("", []))[1]
+
+
+def _criteria_hint(sections: List[str]) -> str:
+    wanted = [f"{section}: {', '.join(_section_criteria(section))}" for section in sections if _section_criteria(section)]
+    return f"criterion is the rubric code the item tests ({'; '.join(wanted)}).\n" if wanted else ""
+
+
 def _system_prompt(level: str, section: str) -> str:
     return (
         "You generate CEFR-aligned English test items.\n"
         f"Level: {level}\n"
         f"Section: {section}\n"
-        "Return JSON with list of items, each: {id, text, options:[{label,text}], correct}.\n"
+        "Return JSON with list of items, each: {id, text, options:[{label,text}], correct, criterion}.\n"
         "Choices must use labels A,B,C,D and correct must be one of them.\n"
+        f"{_criteria_hint([section])}"
         "Keep language concise and level-appropriate."
     )
 
@@ -78,71 +251,893 @@ def _user_prompt(level: str, section: str, count: int, context: Optional[str] =
     return prompt
 
 
-def llm_generate_questions(
-    provider: str, level: str, section: str, count: int, model: Optional[str] = None, context: Optional[str] = None
-) -> List[Dict]:
-    """
-    Generate questions via an LLM provider. Raises LLMNotConfigured if API key missing.
-    Returns a list of question dicts matching test_generator expectations.
-    """
-    provider = provider.lower()
-    model = model or LLM_DEFAULTS.get(provider, {}).get("model")
-    if not model:
-        raise ValueError(f"No default model for provider: {provider}")
+def _multi_system_prompt(level: str) -> str:
+    return (
+        "You generate CEFR-aligned English test items.\n"
+        f"Level: {level}\n"
+        "Return JSON with one list of items per requested section, each item: {id, text, options:[{label,text}], correct, criterion}.\n"
+        "Choices must use labels A,B,C,D and correct must be one of them.\n"
+        f"{_criteria_hint(list(CATEGORY_CRITERIA))}"
+        "Keep language concise and level-appropriate."
+    )
 
-    client = _load_client(provider)
-    system = _system_prompt(level, section)
-    user = _user_prompt(level, section, count, context)
 
+def _multi_user_prompt(level: str, counts: Dict[str, int], context: Optional[str] = None) -> str:
+    wanted = "\n".join(f"- {section}: {count}" for section, count in counts.items())
+    prompt = (
+        f"Generate CEFR {level} questions for these sections (section: number of items):\n{wanted}\n"
+        "Keep passages short (1-3 sentences) and answers brief. "
+        "Return ONLY JSON like {\"sections\":{\"<section>\":[...]}} with exactly the sections listed."
+    )
+    if context:
+        prompt += f"\n\nContext/Topic to use:\n{context}"
+    return prompt
+
+
+def _usage(response, provider: str) -> Dict[str, int]:
+    """Prompt/completion token counts from a provider response (0 when the SDK does not report them)."""
     if provider == "openai":
-        resp = client.ChatCompletion.create(model=model, messages=[{"role": "system", "content": system}, {"role": "user", "content": user}])
-        content = resp.choices[0].message.content
+        usage = getattr(response, "usage", None) or {}
+        get = usage.get if isinstance(usage, dict) else lambda name, default=0: getattr(usage, name, default)
+        return {"prompt_tokens": get("prompt_tokens", 0) or 0, "completion_tokens": get("completion_tokens", 0) or 0}
+    if provider == "anthropic":
+        usage = getattr(response, "usage", None)
+        return {"prompt_tokens": getattr(usage, "input_tokens", 0) or 0, "completion_tokens": getattr(usage, "output_tokens", 0) or 0}
+    usage = getattr(response, "usage_metadata", None)
+    return {"prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0, "completion_tokens": getattr(usage, "candidates_token_count", 0) or 0}
+
+
+def _complete(provider: str, client, model: str, system: str, user: str, usage: Optional[Dict] = None, timeout: Optional[float] = None) -> str:
+    """
+    Send one system+user prompt to the provider and return the raw completion text; token counts go into `usage`.
+    The request is abandoned after `timeout` seconds (default LLM_REQUEST_TIMEOUT).
+    """
+    usage = usage if usage is not None else {}
+    timeout = timeout or LLM_REQUEST_TIMEOUT
+    if provider == "openai":
+        resp = client.ChatCompletion.create(
+            model=model,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            request_timeout=timeout,
+        )
+        usage.update(_usage(resp, provider))
+        return resp.choices[0].message.content
     elif provider == "anthropic":
-        message = client.messages.create(model=model, max_tokens=2048, system=system, messages=[{"role": "user", "content": user}])
-        content = message.content[0].text
+        message = client.messages.create(model=model, max_tokens=2048, system=system, messages=[{"role": "user", "content": user}], timeout=timeout)
+        usage.update(_usage(message, provider))
+        return message.content[0].text
     elif provider == "gemini":
         # Use system_instruction if supported by the SDK version, otherwise fallback to prompt concatenation
         # For simplicity and robustness with latest models, we try to pass system_instruction
         try:
             model_instance = client.GenerativeModel(model, system_instruction=system)
-            message = model_instance.generate_content(user)
+            message = model_instance.generate_content(user, request_options={"timeout": timeout})
         except TypeError:
              # Fallback for older SDKs that might not support system_instruction in init
             model_instance = client.GenerativeModel(model)
             prompt = f"System: {system}\n\nUser: {user}"
-            message = model_instance.generate_content(prompt)
-            
-        content = message.text
+            message = model_instance.generate_content(prompt, request_options={"timeout": timeout})
+
+        usage.update(_usage(message, provider))
+        return message.text
+    elif provider == "replay":
+        return client.complete(model, system, user, usage, timeout=timeout)
+    raise ValueError(f"Unsupported provider: {provider}")
+
+
+def _stream_complete(provider: str, client, model: str, system: str, user: str, usage: Optional[Dict] = None, timeout: Optional[float] = None) -> Iterator[str]:
+    """Like _complete, but yields the completion text in chunks as the provider streams it."""
+    usage = usage if usage is not None else {}
+    timeout = timeout or LLM_REQUEST_TIMEOUT
+    if provider == "openai":
+        stream = client.ChatCompletion.create(
+            model=model,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            stream=True,
+            request_timeout=timeout,
+        )
+        for chunk in stream:
+            text = chunk["choices"][0]["delta"].get("content")
+            if text:
+                yield text
+    elif provider == "anthropic":
+        with client.messages.stream(model=model, max_tokens=2048, system=system, messages=[{"role": "user", "content": user}], timeout=timeout) as stream:
+            yield from stream.text_stream
+            final_message = getattr(stream, "get_final_message", None)  # absent in older SDKs
+            if final_message is not None:
+                usage.update(_usage(final_message(), provider))
+    elif provider == "gemini":
+        try:
+            model_instance = client.GenerativeModel(model, system_instruction=system)
+            response = model_instance.generate_content(user, stream=True, request_options={"timeout": timeout})
+        except TypeError:
+            model_instance = client.GenerativeModel(model)
+            response = model_instance.generate_content(f"System: {system}\n\nUser: {user}", stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        usage.update(_usage(response, provider))
+    elif provider == "replay":
+        yield from client.stream(model, system, user, usage, timeout=timeout)
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
+
+OPTION_LABELS = ("A", "B", "C", "D")
+
+# Extra requests made for items that failed validation before giving up on them.
+MAX_REPAIR_ROUNDS = 2
+
+
+def _normalize_item(item: Dict, section: str, idx: int) -> Dict:
+    options = item.get("options", []) if isinstance(item, dict) else []
+    if not isinstance(item, dict) or not isinstance(options, list):
+        item, options = {}, []
+    criterion = str(item.get("criterion") or "").strip().upper()
+    return {
+        "id": item.get("id") or f"{section[0].upper()}{idx + 1}",
+        "text": str(item.get("text") or "").strip(),
+        "options": [
+            {"label": str(opt.get("label") or "").strip().upper(), "text": str(opt.get("text") or "").strip()}
+            for opt in options
+            if isinstance(opt, dict)
+        ],
+        "correct": str(item.get("correct") or "").strip().upper(),
+        # A missing or foreign rubric code is not worth a repair request: keep the item, criterion unknown ("").
+        "criterion": criterion if criterion in _section_criteria(section) else "",
+        "section": section,
+    }
+
+
+def validate_item(item: Dict) -> List[str]:
+    """Schema problems of a normalized item; an empty list means the item is usable."""
+    problems: List[str] = []
+    if not item["text"]:
+        problems.append("missing text")
+    labels = [opt["label"] for opt in item["options"]]
+    if sorted(labels) != list(OPTION_LABELS):
+        problems.append(f"options must be labelled A-D exactly once (got {labels or 'none'})")
+    if any(not opt["text"] for opt in item["options"]):
+        problems.append("empty option text")
+    if item["correct"] not in labels or item["correct"] not in OPTION_LABELS:
+        problems.append(f"correct must be one of the option labels (got {item['correct'] or 'none'})")
+    return problems
+
+
+def _extract_items(content: str) -> List:
+    """Raw item objects from a completion; complete items are salvaged from truncated or wrapped JSON."""
     try:
         parsed = json.loads(content)
-        items = parsed.get("items", [])
-    except Exception:
-        # If the model returned non-JSON, try to extract a JSON block
-        start = content.find("{")
-        end = content.rfind("}")
-        if start != -1 and end != -1 and end > start:
+        return parsed.get("items", []) if isinstance(parsed, dict) else parsed if isinstance(parsed, list) else []
+    except ValueError:
+        items = ItemStreamParser().feed(content)
+        if items:
+            return items
+        raise ValueError("LLM response did not contain JSON items") from None
+
+
+def _extract_sections(content: str) -> Dict[str, List]:
+    """Raw items per section from a combined {"sections": {...}} completion."""
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError("LLM response did not contain JSON sections") from None
+        try:
             parsed = json.loads(content[start : end + 1])
-            items = parsed.get("items", [])
+        except ValueError:
+            raise ValueError("LLM response did not contain valid JSON sections") from None
+    sections = parsed.get("sections", parsed) if isinstance(parsed, dict) else None
+    if not isinstance(sections, dict):
+        raise ValueError("LLM response did not contain JSON sections")
+    return {
+        str(name).lower(): value.get("items", []) if isinstance(value, dict) else value
+        for name, value in sections.items()
+        if isinstance(value, (list, dict))
+    }
+
+
+def _validated(raw_items: List, section: str, start: int = 0) -> Tuple[List[Dict], List[str]]:
+    """Split raw items into normalized valid items and a list of problems for the rejected ones."""
+    valid: List[Dict] = []
+    problems: List[str] = []
+    for idx, raw in enumerate(raw_items):
+        item = _normalize_item(raw, section, start + len(valid))
+        errors = validate_item(item)
+        if errors:
+            problems.append(f"item {idx + 1}: {'; '.join(errors)}")
         else:
-            raise
-
-    normalized: List[Dict] = []
-    for idx, item in enumerate(items):
-        options = item.get("options", [])
-        # Ensure labels and correct exist
-        normalized.append(
-            {
-                "id": item.get("id") or f"{section[0].upper()}{idx + 1}",
-                "text": item.get("text", ""),
-                "options": [{"label": opt.get("label"), "text": opt.get("text", "")} for opt in options],
-                "correct": item.get("correct", "A"),
-                "section": section,
-            }
-        )
-    return normalized
+            valid.append(item)
+    return valid, problems
+
+
+def _parse_items(content: str, section: str) -> List[Dict]:
+    return _validated(_extract_items(content), section)[0]
+
+
+class ItemStreamParser:
+    """
+    Incremental parser for a streamed {"items": [...]} completion (or a bare [...] array).
+
+    feed() takes the next chunk of text and returns the item objects completed by it, so items
+    can be used while the rest of the response is still arriving. Text before the JSON
+    (e.g. a code fence) is skipped; an item that is not valid JSON is dropped.
+    """
+
+    def __init__(self) -> None:
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._item: Optional[List[str]] = None  # characters of the item currently being read
+        self.skipped = 0
+
+    def _at_item_level(self) -> bool:
+        return self._stack == ["{", "["] or self._stack == ["["]
+
+    def feed(self, chunk: str) -> List[Dict]:
+        items: List[Dict] = []
+        start = 0
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                if ch == "{" and self._at_item_level():
+                    self._item, start = [], i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._item is not None and self._at_item_level():
+                    self._item.append(chunk[start : i + 1])
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except ValueError:
+                        self.skipped += 1
+                    self._item = None
+        if self._item is not None:
+            self._item.append(chunk[start:])
+        return items
+
+
+def _repair_prompt(level: str, section: str, count: int, context: Optional[str], problems: List[str], keep: List[str]) -> str:
+    prompt = _user_prompt(level, section, count, context)
+    prompt += "\n\nA previous answer had invalid items:\n" + "\n".join(f"- {p}" for p in problems[:10])
+    prompt += "\nEach item needs non-empty text, four options labelled A, B, C, D with text, and correct set to one of those labels."
+    if keep:
+        prompt += "\nDo not repeat these existing items:\n" + "\n".join(f"- {text[:120]}" for text in keep)
+    return prompt
+
+
+def _new_call(cancel: Optional[threading.Event] = None) -> Dict:
+    """Telemetry accumulator for one llm_generate_questions/llm_stream_questions call; `cancel` stops it early."""
+    return {"start": time.perf_counter(), "ttfb": None, "prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "cached": 0, "retries": 0, "cancel": cancel}
+
+
+def _add_usage(call: Dict, usage: Dict) -> None:
+    call["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    call["completion_tokens"] += usage.get("completion_tokens", 0)
+
+
+def _record_call(call: Dict, provider: str, model: str, level: str, section: str, outcome: str, stats: Optional[Dict] = None, items: int = 0, error: str = "") -> None:
+    get_telemetry().record(
+        provider,
+        model,
+        outcome,
+        time.perf_counter() - call["start"],
+        ttfb_seconds=call["ttfb"],
+        prompt_tokens=call["prompt_tokens"],
+        completion_tokens=call["completion_tokens"],
+        retries=call["retries"],
+        requests=call["requests"],
+        repairs=(stats or {}).get("repairs", 0),
+        section=section,
+        level=level,
+        items=items,
+        error=error,
+    )
+
+
+def _failed(call: Dict, exc: Exception) -> str:
+    """Outcome of a call that raised: "cancelled" only if it stopped because a hedged request answered first."""
+    return "cancelled" if isinstance(exc, LLMDeadlinePassed) and _cancelled(call) else "error"
+
+
+def _outcome(call: Dict, items: int, count: int) -> str:
+    if call["requests"] == 0:
+        return "cached"
+    return "ok" if items >= count else "partial"
+
+
+def _record_response(provider: str, model: str, system: str, user: str, content: str, usage: Dict, latency: float) -> None:
+    recorder = get_recorder()
+    if recorder is not None and provider != "replay":
+        recorder.record(system, user, content, usage, latency, provider=provider, model=model)
+
+
+def _request(provider: str, model: str, system: str, user: str, use_cache: bool, call: Dict, extract=_extract_items, expires: Optional[float] = None):
+    """
+    One completion (from the response cache when possible), returned as raw item objects (or whatever `extract` parses).
+    With `expires` (time.monotonic() value) the slot wait, the request and any retries must finish by then,
+    otherwise LLMDeadlinePassed is raised.
+    """
+    cache = get_llm_cache() if use_cache else None
+    cache_key = cache.key(provider, model, system, user) if cache else ""
+    content = cache.get(cache_key) if cache else None
+    cached = content is not None
+    if content is None:
+        client = get_client(provider)
+        usage: Dict[str, int] = {}
+        for attempt in itertools.count():
+            try:
+                with _slots(provider).slot(_remaining(expires, call)):
+                    call["requests"] += 1
+                    started = time.perf_counter()
+                    try:
+                        content = _complete(provider, client, model, system, user, usage, timeout=_remaining(expires, call))
+                    except Exception:
+                        # Past our own deadline the error (usually a timeout) becomes LLMDeadlinePassed,
+                        # which says nothing about provider load and so leaves the adaptive limit alone.
+                        _remaining(expires)
+                        raise
+                _record_response(provider, model, system, user, content, usage, time.perf_counter() - started)
+                break
+            except Exception as exc:
+                _remaining(expires)  # e.g. no slot freed up before the deadline
+                if _cancelled(call):
+                    raise  # the hedge was lost: no retry, but the provider's own error still reaches its breaker
+                delay = _retry_delay(exc, attempt, call, expires)
+                if delay is None:
+                    raise
+            time.sleep(delay)  # outside the slot, so other requests can use it meanwhile
+        if call["ttfb"] is None:
+            # Blocking SDK calls only return once the whole body arrived.
+            call["ttfb"] = time.perf_counter() - call["start"]
+        _add_usage(call, usage)
+    else:
+        call["cached"] += 1
+
+    parsed = extract(content)
+    if cache and not cached:
+        # Only completions that parsed are cached, so a bad response is retried next time.
+        cache.put(cache_key, content, provider=provider, model=model)
+    return parsed
+
+
+def _repair(
+    provider: str,
+    model: str,
+    level: str,
+    section: str,
+    count: int,
+    context: Optional[str],
+    items: List[Dict],
+    problems: List[str],
+    use_cache: bool,
+    max_repairs: int,
+    stats: Dict,
+    call: Dict,
+    expires: Optional[float] = None,
+) -> Iterator[Dict]:
+    """
+    Re-request only the missing/invalid items, up to max_repairs rounds; yields the new valid ones.
+    Stops quietly once `expires` passes (or the call is cancelled), keeping the items found so far.
+    """
+    system = _system_prompt(level, section)
+    have = len(items)
+    keep = [item["text"] for item in items]
+    for _ in range(max_repairs):
+        if have >= count:
+            return
+        try:
+            _remaining(expires, call)
+        except LLMDeadlinePassed:
+            return
+        stats["repairs"] += 1
+        user = _repair_prompt(level, section, count - have, context, problems, keep)
+        try:
+            raw_items = _request(provider, model, system, user, use_cache, call, expires=expires)
+        except LLMDeadlinePassed:
+            return
+        except ValueError as exc:
+            problems = [str(exc)]
+            continue
+        more, problems = _validated(raw_items, section, start=have)
+        stats["invalid"] += len(problems)
+        for item in more[: count - have]:
+            have += 1
+            keep.append(item["text"])
+            yield item
+
+
+def _resolve_model(provider: str, model: Optional[str]) -> str:
+    model = model or LLM_DEFAULTS.get(provider, {}).get("model")
+    if not model:
+        raise ValueError(f"No default model for provider: {provider}")
+    return model
+
+
+def _parse_target(target) -> Tuple[str, Optional[str]]:
+    """Accepts "provider", "provider:model" or a (provider, model) pair."""
+    if isinstance(target, str):
+        provider, _, model = target.partition(":")
+        return provider.strip().lower(), model.strip() or None
+    provider, model = target
+    return provider.lower(), model
+
+
+def _probe(provider: str, model: str) -> None:
+    """Smallest possible request, used by an open circuit breaker to detect recovery."""
+    client = get_client(provider)
+    with _slots(provider):
+        _complete(provider, client, model, "Reply with the single word OK.", "ping")
+
+
+def _breaker(provider: str, model: str):
+    return get_breaker(provider, model, probe=lambda: _probe(provider, model))
+
+
+def _targets(provider: str, model: Optional[str], fallbacks: Optional[List]) -> List[Tuple[str, str]]:
+    targets: List[Tuple[str, str]] = []
+    for target in [(provider, model)] + list(fallbacks or []):
+        name, target_model = _parse_target(target)
+        pair = (name, _resolve_model(name, target_model))
+        if pair not in targets:
+            targets.append(pair)
+    return targets
+
+
+def _record_breaker(breaker, exc: Optional[Exception]) -> None:
+    """
+    Feed one attempt's outcome to its circuit breaker. A missing key or SDK trips it at once; an
+    unusable answer (ValueError) or our own deadline/cancellation says nothing about provider health.
+    """
+    if exc is None or isinstance(exc, ValueError):
+        breaker.record_success()
+    elif isinstance(exc, LLMNotConfigured):
+        breaker.record_failure(str(exc), trip=True)
+    elif not isinstance(exc, LLMDeadlinePassed):
+        breaker.record_failure(f"{type(exc).__name__}: {exc}")
+
+
+def _hedge_target(provider: str, model: str, hedge) -> Optional[Tuple[str, str]]:
+    """
+    Backup for a hedged request: hedge="auto" picks the first other provider in LLM_DEFAULTS that is
+    configured and whose circuit is closed; otherwise hedge is "provider" or "provider:model".
+    """
+    if hedge == "auto":
+        for name, defaults in LLM_DEFAULTS.items():
+            if name in (provider, "replay") or not _breaker(name, defaults["model"]).allow():
+                continue
+            try:
+                get_client(name)
+            except (LLMNotConfigured, ValueError):
+                continue
+            return name, defaults["model"]
+        return None
+    name, target_model = _parse_target(hedge)
+    target = (name, _resolve_model(name, target_model))
+    return target if target != (provider, model) and _breaker(*target).allow() else None
+
+
+def _hedged(primary: Tuple[str, str], backup: Tuple[str, str], quantile: float, stats: Dict, generate, expires: Optional[float]):
+    """
+    Run generate(provider, model, stats, cancel) on `primary`; if it has not finished after the
+    `quantile` of its recent call times, start the same request on `backup` and return whichever
+    succeeds first. The other is cancelled: it stops before any further retry or repair request
+    (a provider call already in flight cannot be interrupted) and its result is discarded.
+    Hedges and their winners are counted in llm_telemetry.
+    Returns (result, winner, primary_error): primary_error is set when the primary failed before the
+    backup won. A primary still running when the backup wins reports its eventual outcome to its
+    circuit breaker itself, so the caller only records the primary as healthy when it was the winner.
+    """
+    delay = get_telemetry().quantile(*primary, quantile)
+    delay = HEDGE_DEFAULT_DELAY if delay is None else delay
+    if expires is not None:
+        delay = min(delay, max(0.0, expires - time.monotonic()))
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-hedge")
+    branches: Dict = {}
+
+    def start(target: Tuple[str, str]) -> None:
+        branch_stats = {"invalid": 0, "repairs": 0}
+        cancel = threading.Event()
+        branches[pool.submit(generate, *target, branch_stats, cancel)] = (target, branch_stats, cancel)
+
+    try:
+        start(primary)
+        done, pending = wait(list(branches), timeout=delay)
+        if pending:
+            start(backup)
+            pending = set(branches)
+        first_error: Optional[Exception] = None
+        while True:
+            for future in done:
+                target, branch_stats, _ = branches[future]
+                exc = future.exception()
+                if target == backup:
+                    _record_breaker(_breaker(*backup), exc)
+                if exc is not None:
+                    if target == primary:
+                        first_error = exc
+                    continue
+                for other_future, (other, _, cancel) in branches.items():
+                    if other != target:
+                        cancel.set()
+                        if other == primary and not other_future.done():
+                            other_future.add_done_callback(lambda f: _record_breaker(_breaker(*primary), f.exception()))
+                stats["invalid"] += branch_stats["invalid"]
+                stats["repairs"] += branch_stats["repairs"]
+                if len(branches) > 1:
+                    stats["provider"] = f"{target[0]}/{target[1]}"
+                    get_telemetry().record_hedge(*primary, f"{backup[0]}/{backup[1]}", "backup" if target == backup else "primary")
+                return future.result(), target, first_error
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if len(branches) > 1:
+            get_telemetry().record_hedge(*primary, f"{backup[0]}/{backup[1]}", "none")
+        raise first_error  # reached only when the primary failed (and the backup, if started)
+    finally:
+        pool.shutdown(wait=False)
+
+
+def _with_failover(
+    provider: str,
+    model: Optional[str],
+    fallbacks: Optional[List],
+    stats: Dict,
+    generate,
+    expires: Optional[float] = None,
+    hedge=None,
+    hedge_quantile: Optional[float] = None,
+):
+    """
+    Run generate(provider, model, stats, cancel) on the first target (primary, then fallbacks) whose
+    circuit breaker is closed. Transport failures count against that provider's breaker and move on to
+    the next target; a missing key or SDK trips the breaker at once. With `hedge`, each attempt is a
+    hedged request (see _hedged). Raises CircuitOpenError when every circuit is open,
+    LLMDeadlinePassed as soon as `expires` passes, otherwise the last error.
+    """
+    last_error: Optional[Exception] = None
+    skipped: List[str] = []
+    stats.pop("provider", None)
+    for name, target_model in _targets(provider, model, fallbacks):
+        breaker = _breaker(name, target_model)
+        if not breaker.allow():
+            skipped.append(breaker.name)
+            continue
+        _remaining(expires)
+        backup = _hedge_target(name, target_model, hedge) if hedge else None
+        try:
+            if backup:
+                quantile = HEDGE_QUANTILE if hedge_quantile is None else hedge_quantile
+                result, winner, primary_error = _hedged((name, target_model), backup, quantile, stats, generate, expires)
+            else:
+                result, winner, primary_error = generate(name, target_model, stats, None), (name, target_model), None
+        except LLMDeadlinePassed:
+            raise  # our budget ran out; not the provider's fault
+        except Exception as exc:
+            _record_breaker(breaker, exc)
+            last_error = exc
+            continue
+        if winner == (name, target_model):
+            _record_breaker(breaker, None)
+        elif primary_error is not None:
+            _record_breaker(breaker, primary_error)  # the backup only won because the primary failed
+        stats.setdefault("provider", breaker.name)
+        return result
+    if last_error is not None:
+        raise last_error
+    raise CircuitOpenError(f"circuit open for {', '.join(skipped)}")
+
+
+def _generate_questions(
+    provider: str,
+    level: str,
+    section: str,
+    count: int,
+    model: str,
+    context: Optional[str],
+    use_cache: bool,
+    max_repairs: int,
+    stats: Dict,
+    expires: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> List[Dict]:
+    """One provider/model attempt of llm_generate_questions; `stats` is updated in place."""
+    system = _system_prompt(level, section)
+    user = _user_prompt(level, section, count, context)
+    call = _new_call(cancel)
+    try:
+        try:
+            items, problems = _validated(_request(provider, model, system, user, use_cache, call, expires=expires), section)
+        except ValueError as exc:
+            items, problems = [], [str(exc)]
+        stats["invalid"] += len(problems)
+        items += list(_repair(provider, model, level, section, count, context, items, problems, use_cache, max_repairs, stats, call, expires))
+    except Exception as exc:
+        _record_call(call, provider, model, level, section, _failed(call, exc), stats, error=f"{type(exc).__name__}: {exc}")
+        raise
+    if not items:
+        _record_call(call, provider, model, level, section, "invalid", stats, error="; ".join(problems[:3]))
+        raise ValueError(f"LLM returned no valid {section} items: {'; '.join(problems[:3])}")
+    _record_call(call, provider, model, level, section, _outcome(call, len(items), count), stats, items=len(items))
+    return items
+
+
+def _generate_sections(
+    provider: str,
+    level: str,
+    counts: Dict[str, int],
+    model: str,
+    context: Optional[str],
+    use_cache: bool,
+    max_repairs: int,
+    stats: Dict,
+    expires: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, List[Dict]]:
+    """One provider/model attempt of llm_generate_sections; `stats` is updated in place."""
+    results: Dict[str, List[Dict]] = {}
+    call = _new_call(cancel)
+    try:
+        try:
+            raw_sections = _request(provider, model, _multi_system_prompt(level), _multi_user_prompt(level, counts, context), use_cache, call, extract=_extract_sections, expires=expires)
+            shared_problem: List[str] = []
+        except ValueError as exc:
+            raw_sections, shared_problem = {}, [str(exc)]
+        for section, count in counts.items():
+            items, problems = _validated(raw_sections.get(section, []), section)
+            items = items[:count]
+            if not items and not problems:
+                problems = shared_problem or [f"section {section} missing from the response"]
+            stats["invalid"] += len(problems)
+            items += list(_repair(provider, model, level, section, count, context, items, problems, use_cache, max_repairs, stats, call, expires))
+            results[section] = items
+    except Exception as exc:
+        _record_call(call, provider, model, level, "+".join(counts), _failed(call, exc), stats, error=f"{type(exc).__name__}: {exc}")
+        raise
+    total = sum(len(items) for items in results.values())
+    complete = all(len(results[section]) >= count for section, count in counts.items())
+    outcome = "invalid" if not total else _outcome(call, 1 if complete else 0, 1)
+    _record_call(call, provider, model, level, "+".join(counts), outcome, stats, items=total)
+    return results
+
+
+def llm_generate_questions(
+    provider: str,
+    level: str,
+    section: str,
+    count: int,
+    model: Optional[str] = None,
+    context: Optional[str] = None,
+    use_cache: bool = True,
+    max_repairs: int = MAX_REPAIR_ROUNDS,
+    stats: Optional[Dict] = None,
+    fallbacks: Optional[List] = None,
+    deadline: Optional[float] = None,
+    hedge: Optional[str] = None,
+    hedge_quantile: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Generate questions via an LLM provider. Raises LLMNotConfigured if API key missing.
+    Returns a list of question dicts matching test_generator expectations.
+    Completions are served from the response cache (see llm_cache) unless use_cache=False.
+    Every item is checked with validate_item; invalid ones are dropped and only the shortfall is
+    requested again (at most max_repairs times). Raises ValueError if no valid item was produced.
+    `fallbacks` ("provider" or "provider:model") are tried in order when the provider fails or its
+    circuit breaker is open (see llm_circuit); an open circuit is skipped without a request.
+    If given, `stats` receives counts of invalid items and repair requests, and the "provider/model"
+    that served the call.
+    `deadline` (seconds from now) bounds the whole call including slot waits, retries and repairs:
+    LLMDeadlinePassed is raised if no valid item arrived in time, and repairs still pending at the
+    deadline are dropped, so the call may return fewer than `count` items.
+    `hedge` ("auto", "provider" or "provider:model") opts into hedged requests: if the provider has
+    not answered after the `hedge_quantile` (default HEDGE_QUANTILE) of its recent call times, the
+    same request also goes to the hedge target (with "auto", another configured provider from
+    LLM_DEFAULTS) and the first valid answer wins; the slower request is cancelled.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(invalid=0, repairs=0)
+    expires = _expires(deadline)
+    return _with_failover(
+        provider,
+        model,
+        fallbacks,
+        stats,
+        lambda name, target_model, branch_stats, cancel: _generate_questions(
+            name, level, section, count, target_model, context, use_cache, max_repairs, branch_stats, expires, cancel
+        ),
+        expires,
+        hedge,
+        hedge_quantile,
+    )
+
+
+def llm_generate_sections(
+    provider: str,
+    level: str,
+    counts: Dict[str, int],
+    model: Optional[str] = None,
+    context: Optional[str] = None,
+    use_cache: bool = True,
+    max_repairs: int = MAX_REPAIR_ROUNDS,
+    stats: Optional[Dict] = None,
+    fallbacks: Optional[List] = None,
+    deadline: Optional[float] = None,
+    hedge: Optional[str] = None,
+    hedge_quantile: Optional[float] = None,
+) -> Dict[str, List[Dict]]:
+    """
+    Generate several sections with one request: the instructions are sent once and the answer is
+    split back by section tag. Items are validated as in llm_generate_questions; a section left short
+    (invalid or missing items) is topped up with per-section repair requests.
+    Returns {section: [question dicts]} for every section in `counts`; sections may come back empty.
+    `fallbacks`, `deadline` and `hedge` work as in llm_generate_questions.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(invalid=0, repairs=0)
+    counts = {section: count for section, count in counts.items() if count > 0}
+    expires = _expires(deadline)
+    return _with_failover(
+        provider,
+        model,
+        fallbacks,
+        stats,
+        lambda name, target_model, branch_stats, cancel: _generate_sections(
+            name, level, counts, target_model, context, use_cache, max_repairs, branch_stats, expires, cancel
+        ),
+        expires,
+        hedge,
+        hedge_quantile,
+    )
+
+
+def llm_stream_questions(
+    provider: str,
+    level: str,
+    section: str,
+    count: int,
+    model: Optional[str] = None,
+    context: Optional[str] = None,
+    use_cache: bool = True,
+    max_repairs: int = MAX_REPAIR_ROUNDS,
+    fallbacks: Optional[List] = None,
+    deadline: Optional[float] = None,
+) -> Iterator[Dict]:
+    """
+    Streaming variant of llm_generate_questions: yields each normalized question dict as soon as
+    its JSON object is complete in the provider's token stream. A cached completion is replayed
+    from the response cache. The provider slot is held until the stream ends or the generator is closed.
+    Invalid items are skipped and replaced by repair requests after the stream ends.
+    The stream goes to the first of provider and `fallbacks` whose circuit breaker is closed; a
+    stream cannot switch providers midway, so a failure is raised (and counted by the breaker).
+    With `deadline` (seconds from the first next()) the stream is cut off when time runs out and the
+    items received so far are all that is yielded; LLMDeadlinePassed is raised if the provider had
+    not started answering by then.
+    """
+    expires = _expires(deadline)
+    targets = _targets(provider, model, fallbacks)
+    open_targets = [target for target in targets if _breaker(*target).allow()]
+    if not open_targets:
+        raise CircuitOpenError(f"circuit open for {', '.join(f'{p}/{m}' for p, m in targets)}")
+    provider, model = open_targets[0]
+    breaker = _breaker(provider, model)
+
+    system = _system_prompt(level, section)
+    user = _user_prompt(level, section, count, context)
+    stats = {"invalid": 0, "repairs": 0}
+    items: List[Dict] = []
+    problems: List[str] = []
+    call = _new_call()
+    emitted = 0
+    outcome, error = "error", ""
+    try:
+        cache = get_llm_cache() if use_cache else None
+        cache_key = cache.key(provider, model, system, user) if cache else ""
+        content = cache.get(cache_key) if cache else None
+        if content is not None:
+            call["cached"] += 1
+            items, problems = _validated(_extract_items(content), section)
+            for item in items:
+                emitted += 1
+                yield item
+        else:
+            client = get_client(provider)
+            parser = ItemStreamParser()
+            chunks: List[str] = []
+            usage: Dict[str, int] = {}
+            cut_off = False
+            for attempt in itertools.count():
+                try:
+                    with _slots(provider).slot(_remaining(expires)):
+                        call["requests"] += 1
+                        try:
+                            for chunk in _stream_complete(provider, client, model, system, user, usage, timeout=_remaining(expires)):
+                                if expires is not None and time.monotonic() >= expires:
+                                    cut_off = True
+                                    break
+                                if call["ttfb"] is None:
+                                    call["ttfb"] = time.perf_counter() - call["start"]
+                                chunks.append(chunk)
+                                for raw in parser.feed(chunk):
+                                    item = _normalize_item(raw, section, len(items))
+                                    errors = validate_item(item)
+                                    if errors:
+                                        problems.append(f"item {len(items) + len(problems) + 1}: {'; '.join(errors)}")
+                                        continue
+                                    items.append(item)
+                                    emitted += 1
+                                    yield item
+                        except Exception:
+                            _remaining(expires)  # as in _request: our own deadline must not shrink the adaptive limit
+                            raise
+                    break
+                except Exception as exc:
+                    # Once text has streamed it cannot be replayed transparently, so only failures before the first chunk retry.
+                    _remaining(expires)
+                    delay = None if chunks else _retry_delay(exc, attempt, call, expires)
+                    if delay is None:
+                        raise
+                time.sleep(delay)
+            _add_usage(call, usage)
+            content = "".join(chunks)
+            if not cut_off:
+                _record_response(provider, model, system, user, content, usage, time.perf_counter() - call["start"])
+            if not items and not problems:
+                # Nothing parsed incrementally (e.g. unusual framing): fall back to the whole-response parser.
+                try:
+                    items, problems = _validated(_extract_items(content), section)
+                except ValueError as exc:
+                    problems = [str(exc)]
+                for item in items:
+                    emitted += 1
+                    yield item
+            if cache and items and not parser.skipped and not cut_off:
+                cache.put(cache_key, content, provider=provider, model=model)
+        stats["invalid"] += len(problems)
+        for item in _repair(provider, model, level, section, count, context, items, problems, use_cache, max_repairs, stats, call, expires):
+            emitted += 1
+            yield item
+        outcome = _outcome(call, emitted, count) if emitted else "invalid"
+        _record_breaker(breaker, None)
+    except GeneratorExit:
+        outcome = "partial"  # consumer stopped early
+        raise
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        _record_breaker(breaker, exc)
+        raise
+    finally:
+        _record_call(call, provider, model, level, section, outcome, stats, items=emitted, error=error)
 
 
-__all__ = ["llm_generate_questions", "LLMNotConfigured", "LLM_DEFAULTS"]
+__all__ = [
+    "llm_generate_questions",
+    "llm_stream_questions",
+    "llm_generate_sections",
+    "ItemStreamParser",
+    "validate_item",
+    "MAX_REPAIR_ROUNDS",
+    "LLMNotConfigured",
+    "LLMDeadlinePassed",
+    "CircuitOpenError",
+    "LLM_DEFAULTS",
+    "LLM_CONCURRENCY",
+    "LLM_MAX_CONCURRENCY",
+    "RETRY_POLICY",
+    "LLM_REQUEST_TIMEOUT",
+    "HEDGE_QUANTILE",
+    "HEDGE_DEFAULT_DELAY",
+    "set_provider_concurrency",
+    "provider_concurrency",
+    "get_client",
+    "warm_up",
+    "reset_clients",
+]
@@ -0,0 +1,85 @@
+"""
+Compare per-section and combined (single-call) LLM generation.
+
+Runs generate_test_data repeatedly in each llm_mode and reports provider round trips, tokens,
+estimated cost and per-test latency. Defaults to the offline replay provider, so it needs no
+network; pass --provider openai|anthropic|gemini to measure a live provider.
+
+    python llm_benchmark.py --level B1 --runs 20 --latency-ms 600 --ms-per-token 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Dict, List
+
+from llm_cache import configure_llm_cache
+from llm_telemetry import configure_telemetry
+from test_generator import generate_test_data
+
+MODES = ("per_section", "combined")
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run_mode(mode: str, level: str, runs: int, provider: str, model: str | None) -> Dict:
+    telemetry = configure_telemetry()
+    latencies: List[float] = []
+    fallbacks = 0
+    for run in range(runs):
+        started = time.perf_counter()
+        # A per-run context keeps prompts distinct, so no run is answered from an earlier recording or cache entry.
+        data = generate_test_data(level, use_llm=True, llm_provider=provider, llm_model=model, context=f"benchmark run {run}", use_llm_cache=False, llm_mode=mode)
+        latencies.append(time.perf_counter() - started)
+        fallbacks += bool(data["metadata"]["llm"].get("fallback"))
+    totals = {"round_trips": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+    for entry in telemetry.summary().values():
+        for key in totals:
+            totals[key] += entry[key]
+    return {
+        "mode": mode,
+        "runs": runs,
+        "round_trips_per_test": totals["round_trips"] / runs,
+        "prompt_tokens_per_test": totals["prompt_tokens"] / runs,
+        "completion_tokens_per_test": totals["completion_tokens"] / runs,
+        "cost_usd_per_test": totals["cost_usd"] / runs,
+        "p50_seconds": _quantile(latencies, 0.5),
+        "p95_seconds": _quantile(latencies, 0.95),
+        "fallbacks": fallbacks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-section vs combined LLM generation")
+    parser.add_argument("--level", default="B1")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--provider", default="replay")
+    parser.add_argument("--model")
+    parser.add_argument("--latency-ms", type=float, default=500, help="replay: median base latency per request")
+    parser.add_argument("--ms-per-token", type=float, default=10, help="replay: extra latency per completion token")
+    args = parser.parse_args()
+
+    if args.provider == "replay":
+        os.environ.setdefault("LLM_REPLAY_LATENCY_MS", str(args.latency_ms))
+        os.environ.setdefault("LLM_REPLAY_MS_PER_TOKEN", str(args.ms_per_token))
+    configure_llm_cache(None)
+
+    rows = [run_mode(mode, args.level, args.runs, args.provider, args.model) for mode in MODES]
+    header = f"{'mode':<12} {'trips/test':>10} {'prompt tok':>10} {'compl tok':>10} {'USD/test':>9} {'p50 s':>7} {'p95 s':>7} {'fallbacks':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['mode']:<12} {row['round_trips_per_test']:>10.1f} {row['prompt_tokens_per_test']:>10.0f} "
+            f"{row['completion_tokens_per_test']:>10.0f} {row['cost_usd_per_test']:>9.4f} {row['p50_seconds']:>7.2f} "
+            f"{row['p95_seconds']:>7.2f} {row['fallbacks']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_DIR = ".llm_cache"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of raw LLM completions, addressed by provider, model and the normalized prompts.
+
+    Entries older than `ttl_seconds` are treated as misses and removed; when the directory grows
+    past `max_bytes` the least recently used entries are evicted. Safe to share between processes.
+    """
+
+    def __init__(self, directory: str | Path = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None
+
+    @staticmethod
+    def key(provider: str, model: str, system: str, user: str) -> str:
+        payload = json.dumps([provider.lower(), model, _normalize(system), _normalize(user)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry.get("content")
+
+    def put(self, key: str, content: str, provider: str = "", model: str = "") -> None:
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "provider": provider, "model": model, "content": content}, ensure_ascii=False)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._trim(len(data.encode("utf-8")))
+
+    def _entries(self):
+        for p in self.directory.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            yield st.st_mtime, st.st_size, p
+
+    def _trim(self, added: int) -> None:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += added
+            if self._bytes <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    pass
+            self._bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, p in list(self._entries()):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+            self._bytes = 0
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_lock = threading.Lock()
+_enabled = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "off")
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide response cache configured from LLM_CACHE_DIR / LLM_CACHE_TTL / LLM_CACHE_MAX_MB, or None if disabled."""
+    global _default_cache
+    if not _enabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache(
+                os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+            )
+        return _default_cache
+
+
+def configure_llm_cache(
+    directory: str | Path | None = DEFAULT_CACHE_DIR,
+    ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Optional[LLMResponseCache]:
+    """Replace the process-wide response cache; pass directory=None to disable caching."""
+    global _default_cache, _enabled
+    with _default_lock:
+        _enabled = directory is not None
+        _default_cache = LLMResponseCache(directory, ttl_seconds=ttl_seconds, max_bytes=max_bytes) if directory is not None else None
+        return _default_cache
+
+
+__all__ = ["LLMResponseCache", "get_llm_cache", "configure_llm_cache"]
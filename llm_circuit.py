@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider/model whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Process-wide health switch for one provider/model.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures (or one configuration
+    error such as a missing API key) it opens: calls are refused immediately so callers can fail over
+    without waiting. While open, a daemon thread runs `probe` every `probe_interval` seconds and closes
+    the breaker on the first success.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, probe_interval: float = 30.0, probe: Optional[Callable[[], None]] = None) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.last_error = ""
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+
+    def allow(self) -> bool:
+        return self.state == "closed"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self, error: str, trip: bool = False) -> None:
+        """Count a failure; trip=True opens the breaker at once (e.g. the provider is not configured)."""
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.state == "closed" and (trip or self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.trips += 1
+                self.opened_at = time.time()
+                self._start_probe()
+
+    def _start_probe(self) -> None:
+        if self.probe is None or (self._prober and self._prober.is_alive()):
+            return
+        self._prober = threading.Thread(target=self._probe_loop, name=f"circuit-probe-{self.name}", daemon=True)
+        self._prober.start()
+
+    def _probe_loop(self) -> None:
+        while self.state == "open":
+            time.sleep(self.probe_interval)
+            try:
+                self.probe()
+            except Exception as exc:
+                with self._lock:
+                    self.last_error = f"probe: {exc}"
+                continue
+            self.record_success()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def snapshot(self) -> Dict:
+        return {"state": self.state, "failures": self.failures, "trips": self.trips, "last_error": self.last_error, "opened_at": self.opened_at}
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+# Defaults for breakers created after a change; see configure_breakers.
+BREAKER_DEFAULTS = {"failure_threshold": 3, "probe_interval": 30.0}
+
+
+def get_breaker(provider: str, model: str, probe: Optional[Callable[[], None]] = None) -> CircuitBreaker:
+    key = (provider, model)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(f"{provider}/{model}", probe=probe, **BREAKER_DEFAULTS)
+            _breakers[key] = breaker
+        return breaker
+
+
+def configure_breakers(failure_threshold: Optional[int] = None, probe_interval: Optional[float] = None) -> None:
+    """Change thresholds for every breaker, existing and future."""
+    with _breakers_lock:
+        if failure_threshold is not None:
+            BREAKER_DEFAULTS["failure_threshold"] = failure_threshold
+        if probe_interval is not None:
+            BREAKER_DEFAULTS["probe_interval"] = probe_interval
+        for breaker in _breakers.values():
+            breaker.failure_threshold = BREAKER_DEFAULTS["failure_threshold"]
+            breaker.probe_interval = BREAKER_DEFAULTS["probe_interval"]
+
+
+def breaker_states() -> Dict[str, Dict]:
+    with _breakers_lock:
+        return {breaker.name: breaker.snapshot() for breaker in _breakers.values()}
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        for breaker in _breakers.values():
+            breaker.reset()
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "get_breaker",
+    "configure_breakers",
+    "breaker_states",
+    "reset_breakers",
+    "BREAKER_DEFAULTS",
+]
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from rubric_system import CATEGORY_CRITERIA
+
+DEFAULT_REPLAY_DIR = ".llm_recordings"
+
+
+def recording_key(system: str, user: str) -> str:
+    """Provider-independent key, so responses recorded from one provider replay for any model."""
+    payload = json.dumps([" ".join(system.split()), " ".join(user.split())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseRecorder:
+    """Writes live completions (prompt, text, usage, latency) to `directory` for later replay."""
+
+    def __init__(self, directory: str | Path = DEFAULT_REPLAY_DIR) -> None:
+        self.directory = Path(directory)
+
+    def record(self, system: str, user: str, content: str, usage: Optional[Dict] = None, latency: float = 0.0, provider: str = "", model: str = "") -> None:
+        key = recording_key(system, user)
+        path = self.directory / f"{key}.json"
+        entry = {
+            "system": system,
+            "user": user,
+            "content": content,
+            "usage": usage or {},
+            "latency": round(latency, 4),
+            "provider": provider,
+            "model": model,
+            "recorded_at": time.time(),
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+class ReplayRateLimitError(RuntimeError):
+    """Injected 429, shaped like the SDK errors llm_scheduler.classify_error understands."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("replay: injected rate limit (429)")
+        self.response = type("ReplayResponse", (), {"status_code": 429, "headers": {"retry-after": f"{retry_after:g}"}})()
+
+
+def _synthetic_items(level: str, section: str, count: int, digest: str) -> List[Dict]:
+    criteria = CATEGORY_CRITERIA.get(section, ("", [""]))[1]
+    return [
+        {
+            "id": f"{section[:1].upper() or 'Q'}{i + 1}",
+            "text": f"[{level}] Replay {section} item {i + 1} ({digest})",
+            "options": [{"label": label, "text": f"Replay option {label} {i + 1}"} for label in "ABCD"],
+            "correct": "ABCD"[i % 4],
+            "criterion": criteria[i % len(criteria)],
+        }
+        for i in range(count)
+    ]
+
+
+def _synthetic_content(user: str) -> str:
+    """Schema-valid answer for an unrecorded per-section or multi-section prompt."""
+    digest = hashlib.sha256(user.encode("utf-8")).hexdigest()[:8]
+    match = re.search(r"Generate (\d+) CEFR (\S+) questions for the section '([^']+)'", user)
+    if match:
+        return json.dumps({"items": _synthetic_items(match.group(2), match.group(3), int(match.group(1)), digest)})
+    level_match = re.search(r"Generate CEFR (\S+) questions for these sections", user)
+    level = level_match.group(1) if level_match else ""
+    wanted = re.findall(r"^- (\w+): (\d+)$", user, flags=re.MULTILINE)
+    return json.dumps({"sections": {section: _synthetic_items(level, section, int(count), digest) for section, count in wanted}})
+
+
+class ReplayClient:
+    """
+    Offline stand-in provider ("replay") serving recorded completions with simulated latency and faults.
+
+    Completions come from ResponseRecorder files keyed by prompt; a prompt that was never recorded
+    gets a synthetic, schema-valid answer (or raises when on_miss="error"). Latency is the recorded
+    latency, or a lognormal draw around `latency_ms` plus `ms_per_token` per completion token when
+    those are set, so longer answers take longer as they would live. `rate_limit_rate` and
+    `malformed_rate` inject 429 errors and truncated JSON. Fault and latency draws are seeded per
+    prompt and attempt, so runs repeat regardless of thread scheduling.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_REPLAY_DIR,
+        latency_ms: Optional[float] = None,
+        latency_sigma: float = 0.35,
+        ms_per_token: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+        on_miss: str = "synthesize",
+        chunk_chars: int = 64,
+    ) -> None:
+        self.directory = Path(directory)
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.ms_per_token = ms_per_token
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.on_miss = on_miss
+        self.chunk_chars = chunk_chars
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "ReplayClient":
+        latency = os.getenv("LLM_REPLAY_LATENCY_MS")
+        return cls(
+            os.getenv("LLM_REPLAY_DIR", DEFAULT_REPLAY_DIR),
+            latency_ms=float(latency) if latency else None,
+            ms_per_token=float(os.getenv("LLM_REPLAY_MS_PER_TOKEN", 0)),
+            rate_limit_rate=float(os.getenv("LLM_REPLAY_429_RATE", 0)),
+            malformed_rate=float(os.getenv("LLM_REPLAY_MALFORMED_RATE", 0)),
+            seed=int(os.getenv("LLM_REPLAY_SEED", 0)),
+            on_miss=os.getenv("LLM_REPLAY_ON_MISS", "synthesize"),
+        )
+
+    def _load(self, key: str, system: str, user: str) -> Tuple[str, Dict, float]:
+        try:
+            entry = json.loads((self.directory / f"{key}.json").read_text(encoding="utf-8"))
+            return entry["content"], entry.get("usage", {}), float(entry.get("latency", 0.0))
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            if self.on_miss == "error":
+                raise LookupError(f"replay: no recording for prompt {key[:12]}") from None
+            content = _synthetic_content(user)
+            return content, {"prompt_tokens": (len(system) + len(user)) // 4, "completion_tokens": len(content) // 4}, 0.0
+
+    def _plan(self, system: str, user: str) -> Tuple[str, Dict, float, random.Random]:
+        key = recording_key(system, user)
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        content, usage, recorded = self._load(key, system, user)
+        if self.latency_ms is not None or self.ms_per_token:
+            latency = (self.latency_ms or 0.0) / 1000.0 * math.exp(rng.gauss(0.0, self.latency_sigma))
+            latency += self.ms_per_token / 1000.0 * usage.get("completion_tokens", len(content) // 4)
+        else:
+            latency = recorded
+        if rng.random() < self.rate_limit_rate:
+            time.sleep(latency * 0.1)
+            raise ReplayRateLimitError(self.retry_after)
+        if rng.random() < self.malformed_rate:
+            content = content[: max(1, int(len(content) * rng.uniform(0.3, 0.9)))]
+        return content, usage, latency, rng
+
+    @staticmethod
+    def _wait(seconds: float, timeout: Optional[float]) -> None:
+        """Sleep like a client waiting `seconds` for the server, giving up after `timeout` as the SDKs do."""
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"replay: request timed out after {timeout:.2f}s")
+        time.sleep(seconds)
+
+    def complete(self, model: str, system: str, user: str, usage: Optional[Dict] = None, timeout: Optional[float] = None) -> str:
+        content, recorded_usage, latency, _ = self._plan(system, user)
+        self._wait(latency, timeout)
+        if usage is not None:
+            usage.update(recorded_usage)
+        return content
+
+    def stream(self, model: str, system: str, user: str, usage: Optional[Dict] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        content, recorded_usage, latency, _ = self._plan(system, user)
+        chunks = [content[i : i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)] or [""]
+        # First byte after ~30% of the latency, the rest spread over the remaining time.
+        self._wait(latency * 0.3, timeout)
+        step = latency * 0.7 / len(chunks)
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep(step)
+            yield chunk
+        if usage is not None:
+            usage.update(recorded_usage)
+
+
+_recorder: Optional[ResponseRecorder] = None
+_recorder_lock = threading.Lock()
+_recorder_loaded = False
+
+
+def get_recorder() -> Optional[ResponseRecorder]:
+    """Recorder for live completions when LLM_RECORD_DIR is set (or configure_recording was called)."""
+    global _recorder, _recorder_loaded
+    with _recorder_lock:
+        if not _recorder_loaded:
+            directory = os.getenv("LLM_RECORD_DIR")
+            _recorder = ResponseRecorder(directory) if directory else None
+            _recorder_loaded = True
+        return _recorder
+
+
+def configure_recording(directory: str | Path | None = DEFAULT_REPLAY_DIR) -> Optional[ResponseRecorder]:
+    """Record live completions to `directory`; None stops recording."""
+    global _recorder, _recorder_loaded
+    with _recorder_lock:
+        _recorder = ResponseRecorder(directory) if directory is not None else None
+        _recorder_loaded = True
+        return _recorder
+
+
+__all__ = [
+    "ReplayClient",
+    "ReplayRateLimitError",
+    "ResponseRecorder",
+    "get_recorder",
+    "configure_recording",
+    "recording_key",
+    "DEFAULT_REPLAY_DIR",
+]
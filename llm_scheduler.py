@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional, Tuple
+
+# Status codes that mean "slow down": rate limited, overloaded, or the gateway gave up waiting.
+_THROTTLE_STATUS = {408, 429, 503, 504, 529}
+_THROTTLE_NAMES = ("RateLimit", "Timeout", "Overloaded", "ResourceExhausted", "DeadlineExceeded", "ServiceUnavailable", "TryAgain")
+_TRANSIENT_NAMES = ("APIConnection", "Connection", "InternalServer", "ServerError", "APIError")
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "http_status", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    except AttributeError:
+        return None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> Tuple[str, Optional[float]]:
+    """
+    (kind, retry_after) for a provider error. kind is "throttle" (429/overload/timeout: retry and
+    reduce concurrency), "transient" (5xx/connection: retry) or "fatal" (do not retry).
+    """
+    retry_after = retry_after_seconds(exc)
+    status = _status_code(exc)
+    names = " ".join(cls.__name__ for cls in type(exc).__mro__)
+    if status in _THROTTLE_STATUS or isinstance(exc, TimeoutError) or any(n in names for n in _THROTTLE_NAMES):
+        return "throttle", retry_after
+    if (status is not None and status >= 500) or isinstance(exc, ConnectionError) or any(n in names for n in _TRANSIENT_NAMES):
+        if status is not None and 400 <= status < 500:
+            return "fatal", None
+        return "transient", retry_after
+    return "fatal", None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; a Retry-After hint takes precedence when longer."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+        if retry_after is not None:
+            # Honour the server's hint, plus a little jitter so waiting clients do not return in lockstep.
+            return min(max(retry_after, backoff), self.max_delay * 4) + random.uniform(0, self.base_delay)
+        return backoff
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one provider, used as a context manager around each request.
+
+    Every successful request raises the limit by 1/limit (about +1 per limit's worth of completions)
+    up to `max_limit`; a throttle signal (429, overload, timeout) multiplies it by `backoff`. Throttles
+    from requests that started before the previous decrease are ignored, so one burst of 429s
+    from a single window of requests halves the limit once.
+    """
+
+    def __init__(self, limit: int, max_limit: Optional[int] = None, min_limit: int = 1, backoff: float = 0.5) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit or limit * 4, limit)
+        self.backoff = backoff
+        self._limit = float(limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.throttles = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(math.floor(self._limit)))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Wait for a free slot; returns the start time to pass to release(), or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._in_flight < self.limit, timeout):
+                return None
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, outcome: str = "ok", started: float = 0.0) -> None:
+        """outcome: "ok" grows the limit, "throttle" shrinks it, anything else leaves it unchanged."""
+        with self._cond:
+            self._in_flight -= 1
+            if outcome == "ok":
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+            elif outcome == "throttle":
+                self.throttles += 1
+                if started >= self._last_decrease:
+                    self._last_decrease = time.monotonic()
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Like `with limiter:`, but raises TimeoutError if no slot frees up within `timeout` seconds."""
+        started = self.acquire(timeout)
+        if started is None:
+            raise TimeoutError(f"no free request slot within {timeout:.2f}s")
+        try:
+            yield
+        except Exception as exc:
+            self.release(classify_error(exc)[0], started)
+            raise
+        except BaseException:
+            self.release("cancelled", started)
+            raise
+        self.release("ok", started)
+
+    def __enter__(self) -> "AdaptiveLimiter":
+        started = self.acquire()
+        self._local.__dict__.setdefault("starts", []).append(started)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        started = self._local.starts.pop()
+        if exc is None:
+            self.release("ok", started)
+        elif isinstance(exc, Exception):
+            self.release(classify_error(exc)[0], started)
+        else:
+            self.release("cancelled", started)
+
+
+__all__ = ["AdaptiveLimiter", "RetryPolicy", "classify_error", "retry_after_seconds"]
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds (Prometheus `le` labels).
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+# USD per million tokens (prompt, completion); override or extend for other models.
+TOKEN_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+RECENT_SAMPLES = 1024
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = TOKEN_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, name: str, labels: Dict[str, str]) -> List[str]:
+        out = [f"{name}_bucket{_labels(**labels, le=f'{bound:g}')} {count}" for bound, count in zip(LATENCY_BUCKETS, self.counts)]
+        out.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {self.total}")
+        out.append(f"{name}_sum{_labels(**labels)} {self.sum:.6f}")
+        out.append(f"{name}_count{_labels(**labels)} {self.total}")
+        return out
+
+
+class LLMTelemetry:
+    """
+    Per-call metrics for LLM question generation.
+
+    record() is called once per llm_generate_questions/llm_stream_questions call with wall time,
+    time to first byte, token usage, retries and outcome. Totals and latency histograms are kept
+    per provider/model and exported with prometheus_text(); when `jsonl_path` is set every call is
+    also appended there as one JSON line. Recent wall times are kept for quantile(), which sets the
+    delay of hedged requests; record_hedge() counts which side won each hedge.
+    """
+
+    def __init__(self, jsonl_path: str | Path | None = None) -> None:
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str, str], int] = {}
+        self._tokens: Dict[Tuple[str, str, str], int] = {}
+        self._cost: Dict[Tuple[str, str], float] = {}
+        self._retries: Dict[Tuple[str, str], int] = {}
+        self._repairs: Dict[Tuple[str, str], int] = {}
+        self._round_trips: Dict[Tuple[str, str], int] = {}
+        self._wall: Dict[Tuple[str, str], _Histogram] = {}
+        self._ttfb: Dict[Tuple[str, str], _Histogram] = {}
+        self._recent: Dict[Tuple[str, str], Deque[float]] = {}
+        self._hedges: Dict[Tuple[str, str, str, str], int] = {}
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        outcome: str,
+        wall_seconds: float,
+        ttfb_seconds: Optional[float] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0,
+        repairs: int = 0,
+        requests: int = 0,
+        section: str = "",
+        level: str = "",
+        items: int = 0,
+        error: str = "",
+    ) -> Dict:
+        """Add one call; outcome is ok | partial | cached | invalid | error | cancelled (lost a hedge)."""
+        entry = {
+            "ts": round(time.time(), 3),
+            "provider": provider,
+            "model": model,
+            "level": level,
+            "section": section,
+            "outcome": outcome,
+            "wall_seconds": round(wall_seconds, 4),
+            "ttfb_seconds": round(ttfb_seconds, 4) if ttfb_seconds is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": round(call_cost(model, prompt_tokens, completion_tokens), 6),
+            "retries": retries,
+            "repairs": repairs,
+            "requests": requests,
+            "items": items,
+            "error": error,
+        }
+        key = (provider, model)
+        with self._lock:
+            self._calls[key + (outcome,)] = self._calls.get(key + (outcome,), 0) + 1
+            for kind, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+                self._tokens[key + (kind,)] = self._tokens.get(key + (kind,), 0) + count
+            self._cost[key] = self._cost.get(key, 0.0) + entry["cost_usd"]
+            self._retries[key] = self._retries.get(key, 0) + retries
+            self._repairs[key] = self._repairs.get(key, 0) + repairs
+            self._round_trips[key] = self._round_trips.get(key, 0) + requests
+            # Cache hits and calls that never reached the provider (no key, open circuit) would drag latency towards zero.
+            if requests > 0:
+                self._wall.setdefault(key, _Histogram()).observe(wall_seconds)
+                if ttfb_seconds is not None:
+                    self._ttfb.setdefault(key, _Histogram()).observe(ttfb_seconds)
+            if requests > 0 and outcome in ("ok", "partial"):
+                # Only answered requests set the hedge delay: instant failures (no key, open circuit) would pull
+                # it towards zero and cancelled hedge losers would skew it.
+                self._recent.setdefault(key, deque(maxlen=RECENT_SAMPLES)).append(wall_seconds)
+            if self.jsonl_path:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def record_hedge(self, provider: str, model: str, backup: str, winner: str) -> None:
+        """Count one hedged request on provider/model; winner is primary | backup | none (both failed)."""
+        key = (provider, model, backup, winner)
+        with self._lock:
+            self._hedges[key] = self._hedges.get(key, 0) + 1
+
+    def hedge_win_rate(self, provider: str, model: str) -> Optional[float]:
+        """Share of fired hedges on provider/model that the backup won, or None if none fired."""
+        with self._lock:
+            counts = [(winner, n) for (p, m, _, winner), n in self._hedges.items() if (p, m) == (provider, model)]
+        fired = sum(n for _, n in counts)
+        return sum(n for winner, n in counts if winner == "backup") / fired if fired else None
+
+    def quantile(self, provider: str, model: str, q: float) -> Optional[float]:
+        """q-quantile (0-1) of recent answered (ok/partial) call wall times, or None without samples."""
+        with self._lock:
+            samples = sorted(self._recent.get((provider, model), ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per "provider/model": calls by outcome, tokens, cost, p50/p95 wall time, hedges fired and won."""
+        with self._lock:
+            keys = {key[:2] for key in self._calls}
+            out: Dict[str, Dict] = {}
+            for provider, model in sorted(keys):
+                calls = {outcome: n for (p, m, outcome), n in self._calls.items() if (p, m) == (provider, model)}
+                out[f"{provider}/{model}"] = {
+                    "calls": calls,
+                    "prompt_tokens": self._tokens.get((provider, model, "prompt"), 0),
+                    "completion_tokens": self._tokens.get((provider, model, "completion"), 0),
+                    "cost_usd": round(self._cost.get((provider, model), 0.0), 6),
+                    "retries": self._retries.get((provider, model), 0),
+                    "round_trips": self._round_trips.get((provider, model), 0),
+                }
+        for name, entry in out.items():
+            provider, model = name.split("/", 1)
+            entry["p50_seconds"] = self.quantile(provider, model, 0.5)
+            entry["p95_seconds"] = self.quantile(provider, model, 0.95)
+            with self._lock:
+                entry["hedges"] = sum(n for (p, m, _, _), n in self._hedges.items() if (p, m) == (provider, model))
+            entry["hedge_win_rate"] = self.hedge_win_rate(provider, model)
+        return out
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += ["# HELP llm_requests_total LLM question generation calls.", "# TYPE llm_requests_total counter"]
+            for (provider, model, outcome), n in sorted(self._calls.items()):
+                lines.append(f"llm_requests_total{_labels(provider=provider, model=model, outcome=outcome)} {n}")
+            lines += ["# HELP llm_tokens_total Tokens used by LLM calls.", "# TYPE llm_tokens_total counter"]
+            for (provider, model, kind), n in sorted(self._tokens.items()):
+                lines.append(f"llm_tokens_total{_labels(provider=provider, model=model, type=kind)} {n}")
+            lines += ["# HELP llm_cost_usd_total Estimated spend from TOKEN_PRICES.", "# TYPE llm_cost_usd_total counter"]
+            for (provider, model), cost in sorted(self._cost.items()):
+                lines.append(f"llm_cost_usd_total{_labels(provider=provider, model=model)} {cost:.6f}")
+            lines += ["# HELP llm_retries_total Transport retries of LLM requests.", "# TYPE llm_retries_total counter"]
+            for (provider, model), n in sorted(self._retries.items()):
+                lines.append(f"llm_retries_total{_labels(provider=provider, model=model)} {n}")
+            lines += ["# HELP llm_repairs_total Re-requests for items that failed validation.", "# TYPE llm_repairs_total counter"]
+            for (provider, model), n in sorted(self._repairs.items()):
+                lines.append(f"llm_repairs_total{_labels(provider=provider, model=model)} {n}")
+            lines += ["# HELP llm_round_trips_total Provider requests sent (excluding cache hits).", "# TYPE llm_round_trips_total counter"]
+            for (provider, model), n in sorted(self._round_trips.items()):
+                lines.append(f"llm_round_trips_total{_labels(provider=provider, model=model)} {n}")
+            lines += ["# HELP llm_hedges_total Hedged requests fired, by which side answered first.", "# TYPE llm_hedges_total counter"]
+            for (provider, model, backup, winner), n in sorted(self._hedges.items()):
+                lines.append(f"llm_hedges_total{_labels(provider=provider, model=model, backup=backup, winner=winner)} {n}")
+            for name, help_text, hists in (
+                ("llm_request_duration_seconds", "Wall time of LLM calls that sent at least one request.", self._wall),
+                ("llm_time_to_first_byte_seconds", "Time until the first response bytes arrived.", self._ttfb),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (provider, model), hist in sorted(hists.items()):
+                    lines += hist.lines(name, {"provider": provider, "model": model})
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Write the metrics atomically, e.g. for node_exporter's textfile collector."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+_default_telemetry: Optional[LLMTelemetry] = None
+_default_lock = threading.Lock()
+
+
+def get_telemetry() -> LLMTelemetry:
+    """Process-wide telemetry; LLM_METRICS_JSONL names an optional per-call JSONL file."""
+    global _default_telemetry
+    with _default_lock:
+        if _default_telemetry is None:
+            _default_telemetry = LLMTelemetry(os.getenv("LLM_METRICS_JSONL") or None)
+        return _default_telemetry
+
+
+def configure_telemetry(jsonl_path: str | Path | None = None) -> LLMTelemetry:
+    """Replace the process-wide telemetry (resets all counters)."""
+    global _default_telemetry
+    with _default_lock:
+        _default_telemetry = LLMTelemetry(jsonl_path)
+        return _default_telemetry
+
+
+__all__ = ["LLMTelemetry", "get_telemetry", "configure_telemetry", "call_cost", "TOKEN_PRICES", "LATENCY_BUCKETS"]
@@ -1,31 +1,46 @@
 from __future__ import annotations
 
 import argparse
+import itertools
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional
-
-from html_generator import (
-    export_result_pdf,
-    generate_result_charts,
-    render_answer_key,
-    render_result_report,
-    render_test_paper,
-)
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from bank_replenisher import BankReplenisher
+from cohort_renderer import CohortRenderer
+from grading import AnswerKey, grade_response_file, load_answer_key, score_response_matrix
+from html_generator import render_answer_key, render_test_paper, write_result_report, write_shared_css
+from item_bank import ItemBank
+from llm_adapter import warm_up
+from llm_telemetry import configure_telemetry, get_telemetry
+from report_queue import ReportQueue
 from rubric_system import (
     ASSESSMENT_CRITERIA,
+    CATEGORY_CRITERIA,
+    CATEGORY_WEIGHTS,
+    WRITING_CRITERIA,
     criteria_from_category,
     determine_level,
     recommend_from_categories,
 )
+from similarity_index import DEFAULT_THRESHOLD, NearDuplicateIndex
 from test_generator import LEVEL_CONFIG, export_test_data, generate_test_data, level_names
 
 
 class CEFRTestSystem:
-    def __init__(self, output_dir: str = "outputs") -> None:
+    def __init__(self, output_dir: str = "outputs", asset_mode: str = "inline", chart_files: bool = True) -> None:
+        """
+        asset_mode="external"이면 CSS/차트 이미지를 문서마다 인라인하지 않고 출력 폴더의 공유 파일로 링크한다.
+        chart_files=False이면 external 모드에서도 결과지 차트는 인라인으로 두고 스타일시트만 공유한다.
+        """
+        if asset_mode not in ("inline", "external"):
+            raise ValueError(f"Unknown asset mode: {asset_mode}")
         self.output_dir = Path(output_dir)
+        self.asset_mode = asset_mode
+        self.chart_files = chart_files
         self.paths = {
             "tests": self.output_dir / "tests",
             "answer_keys": self.output_dir / "answer_keys",
@@ -33,12 +48,24 @@ class CEFRTestSystem:
         }
         for path in self.paths.values():
             path.mkdir(parents=True, exist_ok=True)
+        self.report_queue = ReportQueue()
 
     def _timestamp(self) -> str:
         ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
         ts = ts.replace("+00:00", "Z")
         return ts.replace(":", "-")
 
+    def _claim_base_name(self, base_name: str) -> str:
+        """같은 초에 만든 시험지끼리 파일명이 겹치지 않도록 데이터 JSON을 배타적으로 먼저 만들어 이름을 확보한다."""
+        candidate = base_name
+        for n in itertools.count(2):
+            try:
+                with open(self.paths["tests"] / f"test_data_{candidate}.json", "x", encoding="utf-8"):
+                    return candidate
+            except FileExistsError:
+                candidate = f"{base_name}-{n}"
+        raise AssertionError("unreachable")
+
     def generate_test(
         self,
         level: str,
@@ -47,21 +74,68 @@ class CEFRTestSystem:
         llm_provider: str = "openai",
         llm_model: Optional[str] = None,
         context: Optional[str] = None,
+        use_llm_cache: bool = True,
+        item_bank: Optional[ItemBank] = None,
+        bank_exclude: Optional[Iterable[int]] = None,
+        bank_max_uses: Optional[int] = None,
+        variant: Optional[int] = None,
+        similarity_index: Optional[NearDuplicateIndex] = None,
+        max_overlap: float = 0.0,
+        llm_mode: str = "per_section",
+        llm_fallbacks: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
+        llm_hedge: Optional[str] = None,
     ) -> Dict:
-        data = generate_test_data(level, question_counts, use_llm=use_llm, llm_provider=llm_provider, llm_model=llm_model, context=context)
+        """
+        시험지/정답지 HTML과 시험 데이터 JSON을 만든다.
+        variant를 주면 파일명에 `_v003` 형식으로 붙이고, LLM 프롬프트에도 변형 번호를 넣어
+        응답 캐시가 모든 변형에 같은 문항을 돌려주지 않게 한다.
+        deadline(초)을 주면 기한 안에 끝나지 않은 LLM 섹션은 템플릿으로 채워 그 시간 안에 파일을 만든다.
+        """
+        if variant is not None and use_llm:
+            marker = f"Form variant {variant}: write items that differ from other forms of this test."
+            context = f"{context}\n{marker}" if context else marker
+        data = generate_test_data(
+            level,
+            question_counts,
+            use_llm=use_llm,
+            llm_provider=llm_provider,
+            llm_model=llm_model,
+            context=context,
+            use_llm_cache=use_llm_cache,
+            item_bank=item_bank,
+            bank_exclude=bank_exclude,
+            bank_max_uses=bank_max_uses,
+            similarity_index=similarity_index,
+            max_overlap=max_overlap,
+            llm_mode=llm_mode,
+            llm_fallbacks=llm_fallbacks,
+            deadline=deadline,
+            llm_hedge=llm_hedge,
+        )
         ts = self._timestamp()
-        base_name = f"{level}_{ts}"
-
-        test_html = render_test_paper(data)
-        answer_html = render_answer_key(data)
-
+        base_name = f"{level}_{ts}" + (f"_v{variant:03d}" if variant is not None else "")
+        base_name = self._claim_base_name(base_name)
         test_path = self.paths["tests"] / f"test_paper_{base_name}.html"
         answer_path = self.paths["answer_keys"] / f"answer_key_{base_name}.html"
         data_path = self.paths["tests"] / f"test_data_{base_name}.json"
 
-        test_path.write_text(test_html, encoding="utf-8")
-        answer_path.write_text(answer_html, encoding="utf-8")
-        export_test_data(data, data_path)
+        try:
+            test_css = answer_css = None
+            if self.asset_mode == "external":
+                test_css = write_shared_css(self.paths["tests"])
+                answer_css = write_shared_css(self.paths["answer_keys"])
+            test_html = render_test_paper(data, css_href=test_css)
+            answer_html = render_answer_key(data, css_href=answer_css)
+
+            test_path.write_text(test_html, encoding="utf-8")
+            answer_path.write_text(answer_html, encoding="utf-8")
+            export_test_data(data, data_path)
+        except BaseException:
+            # 이름을 확보하며 만든 빈 데이터 JSON(과 쓰다 만 파일)을 지운다. 출력 폴더에 잘못된 JSON이 남지 않게.
+            for path in (test_path, answer_path, data_path):
+                path.unlink(missing_ok=True)
+            raise
 
         return {
             "metadata": data["metadata"],
@@ -72,44 +146,69 @@ class CEFRTestSystem:
             "data_file": str(data_path),
         }
 
-    def evaluate_test(
+    def generate_variants(
+        self,
+        levels: Sequence[str],
+        variants: int = 1,
+        workers: int = 1,
+        use_processes: bool = False,
+        **options,
+    ) -> List[Dict]:
+        """
+        레벨마다 variants개의 시험지를 만든다. 결과는 (레벨, 변형 번호) 순서의 generate_test 반환값 리스트이다.
+        workers > 1이면 스레드 풀(LLM 요청처럼 I/O 위주일 때), use_processes=True이면 프로세스 풀에서 생성한다.
+        프로세스 풀에서는 item_bank를 ItemBank 대신 경로로 넘겨도 되며, 워커마다 따로 연다.
+        similarity_index로 시험지 간 유사 문항을 거를 때는 색인을 공유해야 하므로 스레드 풀만 쓸 수 있다.
+        """
+        jobs = [(level, variant) for level in levels for variant in range(1, variants + 1)]
+        if workers <= 1:
+            return [self.generate_test(level, variant=variant, **options) for level, variant in jobs]
+        if use_processes:
+            if options.get("similarity_index") is not None:
+                raise ValueError("similarity_index is shared in memory; use thread workers (use_processes=False)")
+            bank = options.get("item_bank")
+            if isinstance(bank, ItemBank):
+                options = {**options, "item_bank": str(bank.path)}
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_generate_variant_job, str(self.output_dir), self.asset_mode, level, variant, options)
+                    for level, variant in jobs
+                ]
+                return [future.result() for future in futures]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="test-variant") as pool:
+            futures = [pool.submit(self.generate_test, level, variant=variant, **options) for level, variant in jobs]
+            return [future.result() for future in futures]
+
+    def score_test(
         self,
         level: str,
         student_name: str,
         student_answers: Dict[str, str],
-        correct_answers: Dict[str, str],
+        correct_answers: Union[Dict[str, str], AnswerKey],
         writing_sample: Optional[str] = None,
         llm_feedback: Optional[Dict] = None,
         test_metadata: Optional[Dict] = None,
     ) -> Dict:
+        """채점만 수행하고 결과 dict를 반환한다. 차트/HTML/PDF는 만들지 않는다."""
         ts = self._timestamp()
-        safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", student_name).strip("_") or "student"
         meta = {
             "generated_at": ts,
             "level": level,
             "writing_sample": writing_sample or "",
         }
-        category_weights = {
-            "reading": 24.0,  # 30% of 80
-            "vocabulary": 16.0,  # 20%
-            "grammar": 16.0,  # 20%
-            "conversation": 12.0,  # 15%
-            "writing": 12.0,  # 15%
-        }
-
-        prefix_map = {
-            "reading": ("R", ["R1", "R2", "R3", "R4"]),
-            "vocabulary": ("V", ["V1", "V2", "V3", "V4"]),
-            "grammar": ("G", ["G1", "G2", "G3", "G4"]),
-            "conversation": ("C", ["C1", "C2", "C3", "C4"]),
-        }
+        category_weights = dict(CATEGORY_WEIGHTS)
+        if isinstance(correct_answers, AnswerKey):
+            section_ids = correct_answers.section_ids
+            correct_answers = correct_answers.correct_answers
+        else:
+            section_ids = {cat: [q for q in correct_answers if q.startswith(prefix)] for cat, (prefix, _) in CATEGORY_CRITERIA.items()}
 
         category_scores: Dict[str, float] = {}
         criteria_scores: Dict[str, int] = {}
         total_score = 0.0
 
-        for cat, (prefix, criteria_codes) in prefix_map.items():
-            qids = [q for q in correct_answers if q.startswith(prefix)]
+        for cat, (_, criteria_codes) in CATEGORY_CRITERIA.items():
+            qids = section_ids[cat]
             total = len(qids)
             correct = sum(1 for q in qids if student_answers.get(q) == correct_answers.get(q))
             proportion = (correct / total) if total else 0.0
@@ -128,7 +227,7 @@ class CEFRTestSystem:
         writing_score = writing_proportion * category_weights["writing"]
         category_scores["writing"] = writing_score
         total_score += writing_score
-        for code in ["W1", "W2", "W3", "W4"]:
+        for code in WRITING_CRITERIA:
             score_val = writing_scores.get(code, {}).get("score", 2)
             criteria_scores[code] = int(score_val)
 
@@ -153,17 +252,133 @@ class CEFRTestSystem:
             "metadata": meta,
             "test_metadata": test_metadata or {},
         }
+        return result_data
 
-        chart_images = generate_result_charts(result_data)
-        result_html = render_result_report(result_data, chart_images)
+    def evaluate_test(
+        self,
+        level: str,
+        student_name: str,
+        student_answers: Dict[str, str],
+        correct_answers: Union[Dict[str, str], AnswerKey],
+        writing_sample: Optional[str] = None,
+        llm_feedback: Optional[Dict] = None,
+        test_metadata: Optional[Dict] = None,
+        defer_report: bool = False,
+        chart_backend: str = "png",
+    ) -> Dict:
+        """
+        채점 후 HTML/PDF 결과지를 만든다.
+        defer_report=True이면 점수만 즉시 반환하고 결과지 렌더링은 report_queue에 넣는다
+        (`render_pending_reports`, `ensure_report` 또는 `report_queue.start_workers`로 처리).
+        chart_backend="svg"이면 HTML 결과지의 차트를 matplotlib 없이 인라인 SVG로 넣는다.
+        """
+        result_data = self.score_test(
+            level,
+            student_name,
+            student_answers,
+            correct_answers,
+            writing_sample=writing_sample,
+            llm_feedback=llm_feedback,
+            test_metadata=test_metadata,
+        )
+        ts = result_data["metadata"]["generated_at"]
+        safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", student_name).strip("_") or "student"
         result_path = self.paths["results"] / f"result_{safe_name}_{level}_{ts}.html"
-        result_path.write_text(result_html, encoding="utf-8")
         pdf_path = self.paths["results"] / f"result_{safe_name}_{level}_{ts}.pdf"
-        export_result_pdf(result_data, pdf_path, chart_images)
+        if defer_report:
+            self.report_queue.submit(
+                result_data, result_path, pdf_path, chart_backend=chart_backend, asset_mode=self.asset_mode, chart_files=self.chart_files
+            )
+        else:
+            write_result_report(
+                result_data, result_path, pdf_path, chart_backend=chart_backend, asset_mode=self.asset_mode, chart_files=self.chart_files
+            )
         result_data["result_file"] = str(result_path)
         result_data["result_pdf"] = str(pdf_path)
         return result_data
 
+    def ensure_report(self, result_data: Dict, timeout: Optional[float] = None) -> Dict:
+        """지연된 결과지가 아직 없으면 지금 렌더링하고, 완료된 결과 dict를 그대로 돌려준다."""
+        job = self.report_queue.ensure(result_data["result_file"], timeout=timeout)
+        if job is not None and job.status == "failed":
+            raise RuntimeError(f"Report rendering failed for {job.html_path}: {job.error}")
+        return result_data
+
+    def render_pending_reports(self, workers: int = 1, manifest_path: Optional[str] = None) -> int:
+        """
+        대기 중인 결과지를 모두 렌더링하고 개수를 반환한다.
+        workers > 1이면 CohortRenderer 프로세스 풀로 나눠 처리한다. manifest_path가 있으면 대기 작업(결과 데이터와 경로)을
+        manifest 옆의 spool 파일(<manifest 이름>.jobs.jsonl)에 먼저 기록하므로, 중단된 뒤 새 프로세스에서 같은 manifest_path로
+        다시 호출하면 아직 만들지 못한 결과지까지 이어서 렌더링한다.
+        """
+        if workers <= 1 and manifest_path is None:
+            return self.report_queue.drain()
+        jobs = {job.html_path: job for job in self.report_queue.take_pending()}
+        specs = [(job.result, job.html_path, job.pdf_path, job.options) for job in jobs.values()]
+
+        def on_done(html_path: str, error: str) -> None:
+            if html_path in jobs:  # spooled jobs from an earlier process have no ReportJob here
+                self.report_queue.finish(jobs[html_path], error)
+
+        renderer = CohortRenderer(workers=workers, manifest_path=manifest_path)
+        error = "cohort render interrupted"
+        try:
+            if manifest_path is not None:
+                renderer.spool(specs)
+                specs = renderer.spooled()
+            stats = renderer.render(specs, on_done=on_done)
+            error = ""
+        except Exception as exc:
+            error = f"cohort render failed: {exc}"
+            raise
+        finally:
+            # Still "rendering": skipped as already rendered by an earlier run, or left unfinished by a failure.
+            for job in jobs.values():
+                if job.status == "rendering":
+                    self.report_queue.finish(job, error)
+        return stats["rendered"]
+
+    def evaluate_batch(
+        self,
+        level: str,
+        responses,
+        question_ids: Optional[Sequence[str]],
+        correct_answers: Union[Dict[str, str], AnswerKey],
+        student_names: Optional[List[str]] = None,
+        llm_feedback: Optional[Sequence[Optional[Dict]]] = None,
+    ) -> Dict:
+        """
+        학생 × 문항 응답 행렬을 NumPy 연산으로 일괄 채점한다.
+        responses는 문항 라벨(문자열) 또는 OPTION_LABELS 기준 정수 코드 행렬이며, 열 순서는 question_ids
+        (None이면 정답표 순서)를 따른다. 같은 시험지를 반복 채점할 때는 `load_answer_key`로 만든 AnswerKey를 넘긴다.
+        점수는 evaluate_test와 동일하고, 리포트 파일은 만들지 않는다.
+        """
+        batch = score_response_matrix(responses, question_ids, correct_answers, llm_feedback=llm_feedback)
+        n_students = len(batch["total_score"])
+        if student_names is not None and len(student_names) != n_students:
+            raise ValueError(f"student_names has {len(student_names)} entries for {n_students} students")
+        batch["level"] = level
+        batch["student_names"] = list(student_names) if student_names is not None else [f"student_{i + 1}" for i in range(n_students)]
+        batch["metadata"] = {"generated_at": self._timestamp(), "level": level, "students": n_students}
+        return batch
+
+
+_worker_systems: Dict[tuple, CEFRTestSystem] = {}
+_worker_banks: Dict[str, ItemBank] = {}
+
+
+def _generate_variant_job(output_dir: str, asset_mode: str, level: str, variant: int, options: Dict) -> Dict:
+    """프로세스 풀 워커: 워커마다 CEFRTestSystem/ItemBank를 한 번만 만들어 재사용한다."""
+    key = (output_dir, asset_mode)
+    if key not in _worker_systems:
+        _worker_systems[key] = CEFRTestSystem(output_dir=output_dir, asset_mode=asset_mode)
+    bank = options.get("item_bank")
+    if isinstance(bank, str):
+        if bank not in _worker_banks:
+            _worker_banks[bank] = ItemBank(bank)
+        options = {**options, "item_bank": _worker_banks[bank]}
+    return _worker_systems[key].generate_test(level, variant=variant, **options)
+
 
 def _parse_question_counts(raw: Optional[str]) -> Optional[Dict[str, int]]:
     if not raw:
@@ -176,16 +391,67 @@ def _parse_question_counts(raw: Optional[str]) -> Optional[Dict[str, int]]:
 
 def cli() -> None:
     parser = argparse.ArgumentParser(description="CEFR Level Test System")
-    parser.add_argument("--mode", required=True, choices=["generate", "batch", "sample", "gui"], help="generate|batch|sample|gui")
+    parser.add_argument("--mode", required=True, choices=["generate", "batch", "sample", "gui", "grade", "replenish"], help="generate|batch|sample|gui|grade|replenish")
     parser.add_argument("--level", help="CEFR level (e.g., A2)")
     parser.add_argument("--output-dir", default="outputs", help="Output directory (default: outputs)")
     parser.add_argument("--question-counts", help="Override counts as JSON, e.g. '{\"reading\":10}'")
     parser.add_argument("--use-llm", action="store_true", help="Use LLM to draft questions (requires API key/env)")
-    parser.add_argument("--llm-provider", default="openai", help="LLM provider: openai|anthropic|gemini")
+    parser.add_argument("--llm-provider", default="openai", help="LLM provider: openai|anthropic|gemini|replay (offline, see llm_replay)")
     parser.add_argument("--llm-model", help="Override model name for the provider")
+    parser.add_argument(
+        "--llm-mode",
+        default="per_section",
+        choices=["per_section", "combined"],
+        help="per_section: one concurrent request per section; combined: all sections in one request",
+    )
+    parser.add_argument(
+        "--llm-fallback",
+        help="Comma-separated providers (provider or provider:model) to use while --llm-provider is failing or its circuit is open",
+    )
+    parser.add_argument("--deadline", type=float, help="Seconds per test; LLM sections not done by then are filled from templates")
+    parser.add_argument(
+        "--llm-hedge",
+        help="Also send slow LLM requests to this provider (auto, provider or provider:model) and use the first valid answer",
+    )
+    parser.add_argument("--no-llm-cache", action="store_true", help="Bypass the LLM response cache and always call the provider")
+    parser.add_argument("--item-bank", help="SQLite item bank to draw questions from (generated LLM items are added to it)")
+    parser.add_argument("--bank-max-uses", type=int, help="Skip bank items already used this many times")
+    parser.add_argument("--variants", type=int, default=1, help="Forms to generate per level in batch mode (default: 1)")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel workers for batch mode (default: 1)")
+    parser.add_argument("--use-processes", action="store_true", help="Run batch workers as processes instead of threads")
+    parser.add_argument("--dedupe-index", help="Near-duplicate index file (.npz); loaded if present and saved after generate/batch")
+    parser.add_argument("--dedupe-threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Similarity (0-1) at which items count as near-duplicates (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--max-overlap", type=float, default=0.0, help="Fraction of a form's items that may near-duplicate earlier forms (default: 0)")
+    parser.add_argument("--metrics-jsonl", help="Append one JSON line per LLM call (latency, tokens, cost, outcome) to this file")
+    parser.add_argument("--metrics-out", help="Write LLM call metrics in Prometheus text format to this file when done")
+    parser.add_argument("--forms-ahead", type=int, default=5, help="Forms per level the item bank should cover (replenish mode, default: 5)")
+    parser.add_argument("--refill-rpm", type=float, default=30, help="Max LLM requests per minute while replenishing (default: 30)")
+    parser.add_argument(
+        "--asset-mode",
+        default="inline",
+        choices=["inline", "external"],
+        help="inline: embed CSS/charts in every file; external: link one shared stylesheet (and chart files) per output folder",
+    )
+    parser.add_argument("--inline-charts", action="store_true", help="With --asset-mode external, keep result report charts inline (share only the stylesheet)")
+    parser.add_argument("--test-data", help="Test data JSON written by generate mode (grade mode)")
+    parser.add_argument("--responses", help="Student responses as CSV or JSONL (grade mode)")
+    parser.add_argument("--results-out", help="Output JSONL for grade mode (default: <output-dir>/results/grades_<timestamp>.jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Students graded per chunk in grade mode (default: 10000)")
     args = parser.parse_args()
 
-    system = CEFRTestSystem(output_dir=args.output_dir)
+    if args.metrics_jsonl:
+        configure_telemetry(args.metrics_jsonl)
+    system = CEFRTestSystem(output_dir=args.output_dir, asset_mode=args.asset_mode, chart_files=not args.inline_charts)
+    llm_fallbacks = [target.strip() for target in args.llm_fallback.split(",") if target.strip()] if args.llm_fallback else None
+    if args.use_llm or args.mode == "replenish":  # replenish always calls the LLM
+        warm_up([args.llm_provider])
+    item_bank = ItemBank(args.item_bank) if args.item_bank else None
+    similarity_index = None
+    if args.dedupe_index:
+        if Path(args.dedupe_index).exists():
+            similarity_index = NearDuplicateIndex.load(args.dedupe_index, threshold=args.dedupe_threshold)
+        else:
+            similarity_index = NearDuplicateIndex(threshold=args.dedupe_threshold)
 
     if args.mode == "generate":
         if not args.level:
@@ -197,20 +463,66 @@ def cli() -> None:
             use_llm=args.use_llm,
             llm_provider=args.llm_provider,
             llm_model=args.llm_model,
+            use_llm_cache=not args.no_llm_cache,
+            item_bank=item_bank,
+            bank_max_uses=args.bank_max_uses,
+            similarity_index=similarity_index,
+            max_overlap=args.max_overlap,
+            llm_mode=args.llm_mode,
+            llm_fallbacks=llm_fallbacks,
+            deadline=args.deadline,
+            llm_hedge=args.llm_hedge,
         )
         print(f"[ok] Generated test for {args.level}")
         print(f"  Test paper:     {result['test_file']}")
         print(f"  Answer key:     {result['answer_key_file']}")
         print(f"  Test data JSON: {result['data_file']}")
     elif args.mode == "batch":
-        for level in level_names():
-            result = system.generate_test(
-                level,
-                use_llm=args.use_llm,
-                llm_provider=args.llm_provider,
-                llm_model=args.llm_model,
-            )
-            print(f"[ok] {level}: {result['test_file']}")
+        levels = [args.level] if args.level else level_names()
+        results = system.generate_variants(
+            levels,
+            variants=args.variants,
+            workers=args.workers,
+            use_processes=args.use_processes,
+            use_llm=args.use_llm,
+            llm_provider=args.llm_provider,
+            llm_model=args.llm_model,
+            use_llm_cache=not args.no_llm_cache,
+            item_bank=args.item_bank if args.use_processes else item_bank,
+            bank_max_uses=args.bank_max_uses,
+            similarity_index=similarity_index,
+            max_overlap=args.max_overlap,
+            llm_mode=args.llm_mode,
+            llm_fallbacks=llm_fallbacks,
+            deadline=args.deadline,
+            llm_hedge=args.llm_hedge,
+        )
+        for result in results:
+            print(f"[ok] {result['metadata']['level']}: {result['test_file']}")
+    elif args.mode == "replenish":
+        if item_bank is None:
+            raise SystemExit("--item-bank is required for replenish mode")
+        replenisher = BankReplenisher(
+            item_bank,
+            provider=args.llm_provider,
+            model=args.llm_model,
+            levels=[args.level] if args.level else None,
+            forms_ahead=args.forms_ahead,
+            requests_per_minute=args.refill_rpm,
+            max_uses=args.bank_max_uses,
+        )
+        added = replenisher.run_once()
+        for error in replenisher.errors:
+            print(f"[warn] {error}")
+        print(f"[ok] Added {added} items; {len(replenisher.deficits())} level/section pairs still below target")
+    elif args.mode == "grade":
+        if not args.test_data or not args.responses:
+            raise SystemExit("--test-data and --responses are required for grade mode")
+        answer_key = load_answer_key(args.test_data)
+        out_path = Path(args.results_out) if args.results_out else system.paths["results"] / f"grades_{system._timestamp()}.jsonl"
+        graded = grade_response_file(answer_key, args.responses, out_path, level=args.level, chunk_size=args.chunk_size)
+        print(f"[ok] Graded {graded} students")
+        print(f"  Results JSONL: {out_path}")
     elif args.mode == "sample":
         from generate_sample_result import run_sample
 
@@ -222,6 +534,11 @@ def cli() -> None:
     else:
         raise SystemExit(f"Unknown mode: {args.mode}")
 
+    if similarity_index is not None and args.mode in ("generate", "batch"):
+        similarity_index.save(args.dedupe_index)
+    if args.metrics_out:
+        get_telemetry().write_prometheus(args.metrics_out)
+
 
 if __name__ == "__main__":
     cli()
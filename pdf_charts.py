@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List
+
+from reportlab.graphics.shapes import Circle, Drawing, Line, Polygon, Rect, String
+from reportlab.lib import colors
+
+import chart_style
+from chart_style import CRITERIA_DARK, CRITERIA_LIGHT, lerp_hex, nice_step
+
+_INK = colors.HexColor(chart_style.INK)
+_MUTED = colors.HexColor(chart_style.MUTED)
+_TICK = colors.HexColor(chart_style.TICK)
+_SPINE = colors.HexColor(chart_style.SPINE)
+_GRID = colors.HexColor(chart_style.GRID)
+_ACCENT = colors.HexColor(chart_style.ACCENT)
+_MAX = colors.HexColor(chart_style.MAX_FILL)
+_FONT = "Helvetica"
+
+
+def _text(x: float, y: float, text: str, size: int = 9, fill=_INK, anchor: str = "middle") -> String:
+    return String(x, y, text, fontName=_FONT, fontSize=size, fillColor=fill, textAnchor=anchor)
+
+
+def _grid_line(x1: float, y1: float, x2: float, y2: float) -> Line:
+    return Line(x1, y1, x2, y2, strokeColor=_GRID, strokeDashArray=[3, 2], strokeWidth=0.6)
+
+
+def _frame(x: float, y: float, width: float, height: float) -> Rect:
+    return Rect(x, y, width, height, fillColor=None, strokeColor=_SPINE, strokeWidth=0.6)
+
+
+def pdf_category_bar_chart(result: Dict) -> Drawing:
+    labels = list(result["category_scores"].keys())
+    scores = [result["category_scores"][k] for k in labels]
+    max_scores = [result["category_weights"].get(k, 0) for k in labels]
+    width, height = 460, 245
+    left, right, top, bottom = 40, 12, 26, 44
+    plot_w, plot_h = width - left - right, height - top - bottom
+    step = nice_step(max(scores + max_scores + [1.0]) * 1.05)
+    y_max = step * math.ceil(max(scores + max_scores + [1.0]) * 1.05 / step)
+
+    def y(v: float) -> float:
+        return bottom + (v / y_max) * plot_h
+
+    drawing = Drawing(width, height)
+    drawing.add(_text(width / 2, height - 16, "Category Scores vs Max", size=11))
+    tick = 0.0
+    while tick <= y_max + 1e-9:
+        drawing.add(_grid_line(left, y(tick), left + plot_w, y(tick)))
+        drawing.add(_text(left - 4, y(tick) - 3, f"{tick:g}", size=8, anchor="end"))
+        tick += step
+    slot = plot_w / max(len(labels), 1)
+    bar_w = slot * 0.38
+    for idx, (label, score, max_score) in enumerate(zip(labels, scores, max_scores)):
+        cx = left + slot * (idx + 0.5)
+        drawing.add(Rect(cx - bar_w, y(0), bar_w, y(score) - y(0), fillColor=_ACCENT, strokeColor=None))
+        drawing.add(Rect(cx, y(0), bar_w, y(max_score) - y(0), fillColor=_MAX, strokeColor=None))
+        drawing.add(_text(cx, bottom - 14, label.title(), size=8))
+    drawing.add(_frame(left, bottom, plot_w, plot_h))
+    legend_x = left + plot_w - 64
+    drawing.add(Rect(legend_x, bottom + plot_h - 34, 58, 28, fillColor=colors.white, strokeColor=_SPINE, strokeWidth=0.6))
+    drawing.add(Rect(legend_x + 6, bottom + plot_h - 15, 10, 6, fillColor=_ACCENT, strokeColor=None))
+    drawing.add(_text(legend_x + 20, bottom + plot_h - 15, "Score", size=8, anchor="start"))
+    drawing.add(Rect(legend_x + 6, bottom + plot_h - 28, 10, 6, fillColor=_MAX, strokeColor=None))
+    drawing.add(_text(legend_x + 20, bottom + plot_h - 28, "Max", size=8, anchor="start"))
+    drawing.add(_text(left, 6, "Points", size=8, fill=_MUTED, anchor="start"))
+    return drawing
+
+
+def pdf_category_radar_chart(result: Dict) -> Drawing:
+    labels = list(result["category_scores"].keys())
+    values = [
+        (result["category_scores"].get(k, 0) / result["category_weights"].get(k, 1)) if result["category_weights"].get(k) else 0
+        for k in labels
+    ]
+    width, height = 460, 330
+    cx, cy, radius = width / 2, height / 2 - 10, 120
+    # First spoke points east, angles increase counter-clockwise (as in the SVG and matplotlib charts).
+    angles = [2 * math.pi * i / max(len(labels), 1) for i in range(len(labels))]
+
+    drawing = Drawing(width, height)
+    drawing.add(_text(cx, height - 16, "Category Performance (0-1)", size=11))
+    for ring in (0.25, 0.5, 0.75, 1.0):
+        drawing.add(Circle(cx, cy, radius * ring, fillColor=None, strokeColor=_GRID, strokeDashArray=[3, 2], strokeWidth=0.6))
+        drawing.add(_text(cx + 3, cy + radius * ring + 2, f"{ring:g}", size=7, fill=_TICK, anchor="start"))
+    for angle, label in zip(angles, labels):
+        drawing.add(Line(cx, cy, cx + radius * math.cos(angle), cy + radius * math.sin(angle), strokeColor=_GRID, strokeWidth=0.6))
+        lx, ly = cx + (radius + 14) * math.cos(angle), cy + (radius + 14) * math.sin(angle)
+        anchor = "start" if math.cos(angle) > 0.2 else "end" if math.cos(angle) < -0.2 else "middle"
+        drawing.add(_text(lx, ly - 3, label.title(), size=9, anchor=anchor))
+    drawing.add(Circle(cx, cy, radius, fillColor=None, strokeColor=_SPINE, strokeWidth=0.6))
+    if labels:
+        points: List[float] = []
+        for angle, value in zip(angles, values):
+            r = radius * max(0.0, min(1.0, value))
+            points += [cx + r * math.cos(angle), cy + r * math.sin(angle)]
+        drawing.add(Polygon(points, fillColor=_ACCENT, fillOpacity=0.25, strokeColor=_ACCENT, strokeWidth=1.5))
+    return drawing
+
+
+def pdf_criteria_bar_chart(result: Dict) -> Drawing:
+    codes = list(result["criteria_meta"].keys())
+    scores = [result["criteria_scores"].get(code, 0) for code in codes]
+    width, height = 460, 430
+    left, right, top, bottom = 36, 14, 26, 34
+    plot_w, plot_h = width - left - right, height - top - bottom
+    x_max = 4.2
+
+    def x(v: float) -> float:
+        return left + (max(0.0, min(v, x_max)) / x_max) * plot_w
+
+    drawing = Drawing(width, height)
+    drawing.add(_text(width / 2, height - 16, "20-Criteria Checklist Scores", size=11))
+    for tick in range(5):
+        drawing.add(_grid_line(x(tick), bottom, x(tick), bottom + plot_h))
+        drawing.add(_text(x(tick), bottom - 11, str(tick), size=8))
+    row_h = plot_h / max(len(codes), 1)
+    for idx, (code, score) in enumerate(zip(codes, scores)):
+        shade = colors.HexColor(lerp_hex(CRITERIA_LIGHT, CRITERIA_DARK, idx / max(len(codes) - 1, 1)))
+        y0 = bottom + plot_h - row_h * (idx + 1)
+        drawing.add(Rect(left, y0 + row_h * 0.1, x(score) - left, row_h * 0.8, fillColor=shade, strokeColor=None))
+        drawing.add(_text(left - 4, y0 + row_h / 2 - 3, code, size=8, anchor="end"))
+    drawing.add(_frame(left, bottom, plot_w, plot_h))
+    drawing.add(_text(left + plot_w / 2, 6, "Score (0-4)", size=8, fill=_MUTED))
+    return drawing
+
+
+def generate_pdf_charts(result: Dict) -> Dict[str, Drawing]:
+    """Vector (reportlab graphics) versions of the result report charts for the PDF, drawn without matplotlib."""
+    return {
+        "categories_bar": pdf_category_bar_chart(result),
+        "categories_radar": pdf_category_radar_chart(result),
+        "criteria_bar": pdf_criteria_bar_chart(result),
+    }
+
+
+__all__ = ["generate_pdf_charts", "pdf_category_bar_chart", "pdf_category_radar_chart", "pdf_criteria_bar_chart"]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from html_generator import write_result_report
+
+# pyplot keeps global figure state, so charts are rendered one at a time per process.
+_RENDER_LOCK = threading.Lock()
+
+
+class ReportJob:
+    """A deferred HTML+PDF result report for one scored student."""
+
+    def __init__(self, result: Dict, html_path: str | Path, pdf_path: str | Path, options: Optional[Dict] = None) -> None:
+        self.result = result
+        self.html_path = str(html_path)
+        self.pdf_path = str(pdf_path)
+        self.options = options or {}  # extra keyword arguments for the render function
+        self.status = "pending"  # pending | rendering | done | failed
+        self.error = ""
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class ReportQueue:
+    """
+    Queue of result reports whose rendering was deferred by `evaluate_test(defer_report=True)`.
+    Reports are rendered by background workers (`start_workers`), in bulk (`drain`),
+    or on demand the first time someone asks for one (`ensure`).
+    Finished jobs are dropped from the queue (with their result payload) as soon as they are done;
+    failed jobs are kept until `job` or `ensure` hands them to a caller.
+    """
+
+    def __init__(self, render: Callable[..., object] = write_result_report) -> None:
+        self._render = render
+        self._queue: "queue.Queue[Optional[ReportJob]]" = queue.Queue()
+        self._jobs: Dict[str, ReportJob] = {}
+        self._jobs_lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, result: Dict, html_path: str | Path, pdf_path: str | Path, **options) -> ReportJob:
+        job = ReportJob(dict(result), html_path, pdf_path, options)
+        with self._jobs_lock:
+            self._jobs[job.html_path] = job
+        self._queue.put(job)
+        return job
+
+    def job(self, html_path: str | Path) -> Optional[ReportJob]:
+        """The unfinished or failed job for `html_path`; None once it rendered (or if it was never deferred)."""
+        with self._jobs_lock:
+            job = self._jobs.get(str(html_path))
+        if job is not None and job.status == "failed":
+            self._drop(job)  # reported to this caller; not kept any longer
+        return job
+
+    def _drop(self, job: ReportJob) -> None:
+        with self._jobs_lock:
+            if self._jobs.get(job.html_path) is job:
+                del self._jobs[job.html_path]
+
+    def pending(self) -> int:
+        with self._jobs_lock:
+            return sum(1 for job in self._jobs.values() if job.status in ("pending", "rendering"))
+
+    def _run(self, job: ReportJob, blocking: bool = True) -> bool:
+        """Render `job` unless another thread has claimed it; True only if this call rendered it successfully."""
+        # The per-job lock makes a worker and an on-demand request render a report only once.
+        # blocking=False returns at once when another thread already holds it (i.e. is rendering the job).
+        if not job._lock.acquire(blocking=blocking):
+            return False
+        try:
+            if job.status != "pending":
+                return False
+            job.status = "rendering"
+            try:
+                with _RENDER_LOCK:
+                    self._render(job.result, job.html_path, job.pdf_path, **job.options)
+                job.status = "done"
+            except Exception as exc:
+                job.status = "failed"
+                job.error = str(exc)
+            finally:
+                job._done.set()
+        finally:
+            job._lock.release()
+        if job.status != "done":
+            return False
+        self._drop(job)
+        return True
+
+    def ensure(self, html_path: str | Path, timeout: Optional[float] = None) -> Optional[ReportJob]:
+        """
+        Render the report now if no worker has picked it up yet, then wait for it.
+        A job already being rendered elsewhere is only waited on, so `timeout` bounds the whole call.
+        Returns None when there is nothing to wait for (the report already rendered or was never deferred).
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(str(html_path))
+        if job is None:
+            return None
+        if job.status == "pending":
+            self._run(job, blocking=False)
+        job.wait(timeout)
+        if job.status == "failed":
+            self._drop(job)
+        return job
+
+    def drain(self) -> int:
+        """Render every queued report in the calling thread; returns the number rendered successfully."""
+        rendered = 0
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return rendered
+            if job is not None and self._run(job):
+                rendered += 1
+            self._queue.task_done()
+
+    def take_pending(self) -> List[ReportJob]:
+        """Remove all queued jobs and mark them as rendering, for hand-off to another renderer."""
+        taken: List[ReportJob] = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return taken
+            if job is not None and job._lock.acquire(blocking=False):
+                try:
+                    if job.status == "pending":
+                        job.status = "rendering"
+                        taken.append(job)
+                finally:
+                    job._lock.release()
+            self._queue.task_done()
+
+    def finish(self, job: ReportJob, error: str = "") -> None:
+        """Record the outcome of a job rendered outside this queue."""
+        job.status = "failed" if error else "done"
+        job.error = error
+        job._done.set()
+        if job.status == "done":
+            self._drop(job)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def start_workers(self, count: int = 1) -> None:
+        for _ in range(count):
+            thread = threading.Thread(target=self._worker, name="report-worker", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop background workers after the jobs already queued have been rendered."""
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for thread in self._workers:
+                thread.join()
+        self._workers = []
+
+
+__all__ = ["ReportJob", "ReportQueue"]
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 ASSESSMENT_CRITERIA: Dict[str, Dict[str, str]] = {
     "R1": {"criterion": "Main Idea Comprehension", "description": "Identify the main idea of a short text."},
@@ -25,6 +25,25 @@ ASSESSMENT_CRITERIA: Dict[str, Dict[str, str]] = {
     "W4": {"criterion": "Lexical Resource", "description": "Use varied and accurate vocabulary in writing."},
 }
 
+# 카테고리별 배점 (총 80점)
+CATEGORY_WEIGHTS: Dict[str, float] = {
+    "reading": 24.0,  # 30% of 80
+    "vocabulary": 16.0,  # 20%
+    "grammar": 16.0,  # 20%
+    "conversation": 12.0,  # 15%
+    "writing": 12.0,  # 15%
+}
+
+# 객관식 카테고리: 문항 ID 접두사와 연결된 루브릭 코드 (채점 순서 유지)
+CATEGORY_CRITERIA: Dict[str, Tuple[str, List[str]]] = {
+    "reading": ("R", ["R1", "R2", "R3", "R4"]),
+    "vocabulary": ("V", ["V1", "V2", "V3", "V4"]),
+    "grammar": ("G", ["G1", "G2", "G3", "G4"]),
+    "conversation": ("C", ["C1", "C2", "C3", "C4"]),
+}
+
+WRITING_CRITERIA: List[str] = ["W1", "W2", "W3", "W4"]
+
 LEVEL_THRESHOLDS = [
     ("B2", 71),
     ("B1", 59),
@@ -66,4 +85,13 @@ def recommend_from_categories(category_scores: Dict[str, float]) -> List[str]:
     return recommendations
 
 
-__all__ = ["ASSESSMENT_CRITERIA", "LEVEL_THRESHOLDS", "determine_level", "criteria_from_category", "recommend_from_categories"]
+__all__ = [
+    "ASSESSMENT_CRITERIA",
+    "CATEGORY_WEIGHTS",
+    "CATEGORY_CRITERIA",
+    "WRITING_CRITERIA",
+    "LEVEL_THRESHOLDS",
+    "determine_level",
+    "criteria_from_category",
+    "recommend_from_categories",
+]
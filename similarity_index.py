@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+DEFAULT_THRESHOLD = 0.8
+
+
+def item_text(item: Dict) -> str:
+    """Normalized stem + option texts; labels are left out so reordered options still match."""
+    parts = [str(item.get("text", ""))] + sorted(str(opt.get("text", "")) for opt in item.get("options", []))
+    return " | ".join(" ".join(part.lower().split()) for part in parts)
+
+
+def shingles(text: str, k: int = 5) -> List[str]:
+    if len(text) <= k:
+        return [text]
+    return list({text[i : i + k] for i in range(len(text) - k + 1)})
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of test items for near-duplicate detection.
+
+    Each item is reduced to character shingles of its stem and options and summarized by a
+    `num_perm`-value MinHash signature. Signatures are split into `bands` LSH bands, so a query
+    only compares against items sharing a band bucket; cost per query does not grow with the
+    corpus. Similarity is the estimated Jaccard overlap of the shingle sets (0-1).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = 32, bands: int = 8, shingle_size: int = 5, seed: int = 1) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._band_mult = rng.integers(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._lock = threading.Lock()
+        # Held by callers that query and then add as one step (generate_test_data screening a form), so
+        # concurrent forms see each other's accepted items. query/add/save take only the internal lock.
+        self.screen_lock = threading.RLock()
+        self._keys: List[str] = []
+        self._key_pos: Dict[str, int] = {}
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._key_pos
+
+    def signature(self, item: Dict) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(item_text(item), self.shingle_size)),
+            dtype=np.uint64,
+        ) % np.uint64(_PRIME)
+        return ((np.outer(hashes, self._a) + self._b) % np.uint64(_PRIME)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        bands = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_mult).sum(axis=2)  # wraps modulo 2**64; collisions are re-checked
+
+    def query(self, item: Dict, threshold: Optional[float] = None, signature: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Indexed items at or above `threshold` similarity, most similar first."""
+        threshold = self.threshold if threshold is None else threshold
+        sig = self.signature(item) if signature is None else signature
+        band_keys = self._band_keys(sig)[0].tolist()
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(band_keys):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return []
+            positions = np.fromiter(candidates, dtype=np.int64)
+            sims = (self._signatures[positions] == sig).mean(axis=1)
+            keys = [self._keys[p] for p in positions]
+        hits = [(key, float(sim)) for key, sim in zip(keys, sims) if sim >= threshold]
+        hits.sort(key=lambda kv: kv[1], reverse=True)
+        return hits
+
+    def is_duplicate(self, item: Dict, threshold: Optional[float] = None) -> bool:
+        return bool(self.query(item, threshold))
+
+    def add(self, key: str, item: Dict, signature: Optional[np.ndarray] = None) -> bool:
+        """Index an item under `key`; returns False if the key is already present."""
+        if key in self._key_pos:
+            return False
+        return self._insert(key, self.signature(item) if signature is None else signature)
+
+    def _insert(self, key: str, sig: np.ndarray) -> bool:
+        band_keys = self._band_keys(sig)[0].tolist()
+        with self._lock:
+            if key in self._key_pos:
+                return False
+            pos = len(self._keys)
+            if pos == len(self._signatures):
+                grown = np.empty((pos * 2, self.num_perm), dtype=np.uint32)
+                grown[:pos] = self._signatures
+                self._signatures = grown
+            self._signatures[pos] = sig
+            self._keys.append(key)
+            self._key_pos[key] = pos
+            for band, band_key in enumerate(band_keys):
+                self._buckets[band].setdefault(band_key, []).append(pos)
+        return True
+
+    def add_many(self, entries: Iterable[Tuple[str, Dict]]) -> int:
+        return sum(self.add(key, item) for key, item in entries)
+
+    def save(self, path: str | Path) -> None:
+        with self._lock, open(path, "wb") as f:  # file handle: keep the exact path (no implicit .npz suffix)
+            n = len(self._keys)
+            np.savez_compressed(
+                f,
+                keys=np.array(self._keys, dtype=str),  # plain unicode array: loads without pickle
+                signatures=self._signatures[:n],
+                params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed]),
+                threshold=np.array(self.threshold),
+            )
+
+    @classmethod
+    def load(cls, path: str | Path, threshold: Optional[float] = None) -> "NearDuplicateIndex":
+        with np.load(path, allow_pickle=False) as data:
+            num_perm, bands, shingle_size, seed = (int(v) for v in data["params"])
+            index = cls(
+                threshold=float(data["threshold"]) if threshold is None else threshold,
+                num_perm=num_perm,
+                bands=bands,
+                shingle_size=shingle_size,
+                seed=seed,
+            )
+            keys = data["keys"].tolist()
+            signatures = data["signatures"]
+        if keys:
+            index._signatures = np.array(signatures, dtype=np.uint32)
+            index._keys = keys
+            index._key_pos = {key: pos for pos, key in enumerate(keys)}
+            for pos, band_keys in enumerate(index._band_keys(signatures).tolist()):
+                for band, band_key in enumerate(band_keys):
+                    index._buckets[band].setdefault(band_key, []).append(pos)
+        return index
+
+
+__all__ = ["NearDuplicateIndex", "item_text", "shingles", "DEFAULT_THRESHOLD"]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+from html import escape
+from typing import Dict, List
+
+from chart_style import ACCENT, CRITERIA_DARK, CRITERIA_LIGHT, GRID, INK, MAX_FILL, MUTED, SPINE, TICK, lerp_hex, nice_step
+
+_FONT = "font-family='Segoe UI, Arial, sans-serif'"
+
+
+def _svg(width: int, height: int, body: List[str], title: str) -> str:
+    return (
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {width} {height}' role='img' aria-label='{escape(title)}' {_FONT}>"
+        f"<rect width='{width}' height='{height}' fill='#ffffff'/>"
+        + "".join(body)
+        + "</svg>"
+    )
+
+
+def _text(x: float, y: float, text: str, size: int = 12, fill: str = INK, anchor: str = "middle", extra: str = "") -> str:
+    return f"<text x='{x:.1f}' y='{y:.1f}' font-size='{size}' fill='{fill}' text-anchor='{anchor}' {extra}>{escape(text)}</text>"
+
+
+def svg_category_bar_chart(result: Dict) -> str:
+    labels = list(result["category_scores"].keys())
+    scores = [result["category_scores"][k] for k in labels]
+    max_scores = [result["category_weights"].get(k, 0) for k in labels]
+    width, height = 620, 330
+    left, right, top, bottom = 56, 16, 36, 64
+    plot_w, plot_h = width - left - right, height - top - bottom
+    step = nice_step(max(scores + max_scores + [1.0]) * 1.05)
+    y_max = step * math.ceil(max(scores + max_scores + [1.0]) * 1.05 / step)
+
+    def y(v: float) -> float:
+        return top + plot_h - (v / y_max) * plot_h
+
+    body: List[str] = [_text(width / 2, 22, "Category Scores vs Max", size=14)]
+    tick = 0.0
+    while tick <= y_max + 1e-9:
+        body.append(f"<line x1='{left}' x2='{left + plot_w}' y1='{y(tick):.1f}' y2='{y(tick):.1f}' stroke='{GRID}' stroke-dasharray='4 3'/>")
+        body.append(_text(left - 6, y(tick) + 4, f"{tick:g}", size=11, anchor="end"))
+        tick += step
+    slot = plot_w / max(len(labels), 1)
+    bar_w = slot * 0.38
+    for idx, (label, score, max_score) in enumerate(zip(labels, scores, max_scores)):
+        cx = left + slot * (idx + 0.5)
+        body.append(f"<rect x='{cx - bar_w:.1f}' y='{y(score):.1f}' width='{bar_w:.1f}' height='{y(0) - y(score):.1f}' fill='{ACCENT}'/>")
+        body.append(f"<rect x='{cx:.1f}' y='{y(max_score):.1f}' width='{bar_w:.1f}' height='{y(0) - y(max_score):.1f}' fill='{MAX_FILL}'/>")
+        body.append(_text(cx, top + plot_h + 18, label.title(), size=11, anchor="end", extra=f"transform='rotate(-18 {cx:.1f} {top + plot_h + 18:.1f})'"))
+    body.append(f"<rect x='{left}' y='{top}' width='{plot_w}' height='{plot_h}' fill='none' stroke='{SPINE}'/>")
+    body.append(_text(16, top + plot_h / 2, "Points", size=11, fill=MUTED, extra=f"transform='rotate(-90 16 {top + plot_h / 2:.1f})'"))
+    legend_x = left + plot_w - 86
+    body.append(f"<rect x='{legend_x}' y='{top + 6}' width='80' height='40' fill='#ffffff' stroke='{SPINE}' rx='3'/>")
+    body.append(f"<rect x='{legend_x + 8}' y='{top + 13}' width='14' height='8' fill='{ACCENT}'/>")
+    body.append(_text(legend_x + 28, top + 21, "Score", size=11, anchor="start"))
+    body.append(f"<rect x='{legend_x + 8}' y='{top + 29}' width='14' height='8' fill='{MAX_FILL}'/>")
+    body.append(_text(legend_x + 28, top + 37, "Max", size=11, anchor="start"))
+    return _svg(width, height, body, "Category bar chart")
+
+
+def svg_category_radar_chart(result: Dict) -> str:
+    labels = list(result["category_scores"].keys())
+    values = [
+        (result["category_scores"].get(k, 0) / result["category_weights"].get(k, 1)) if result["category_weights"].get(k) else 0
+        for k in labels
+    ]
+    size = 500
+    cx, cy, radius = size / 2, size / 2 + 14, 170
+    # Match matplotlib's polar axes: first spoke points east, angles increase counter-clockwise.
+    angles = [2 * math.pi * i / max(len(labels), 1) for i in range(len(labels))]
+
+    def point(angle: float, r: float) -> str:
+        return f"{cx + r * math.cos(angle):.1f},{cy - r * math.sin(angle):.1f}"
+
+    body: List[str] = [_text(cx, 24, "Category Performance (0-1)", size=14)]
+    for ring in (0.25, 0.5, 0.75, 1.0):
+        body.append(f"<circle cx='{cx}' cy='{cy}' r='{radius * ring:.1f}' fill='none' stroke='{GRID}' stroke-dasharray='4 3'/>")
+        body.append(_text(cx + 4, cy - radius * ring - 3, f"{ring:g}", size=10, fill=TICK, anchor="start"))
+    for angle, label in zip(angles, labels):
+        body.append(f"<line x1='{cx}' y1='{cy}' x2='{cx + radius * math.cos(angle):.1f}' y2='{cy - radius * math.sin(angle):.1f}' stroke='{GRID}'/>")
+        lx, ly = cx + (radius + 22) * math.cos(angle), cy - (radius + 22) * math.sin(angle)
+        anchor = "start" if math.cos(angle) > 0.2 else "end" if math.cos(angle) < -0.2 else "middle"
+        body.append(_text(lx, ly + 4, label.title(), size=12, anchor=anchor))
+    body.append(f"<circle cx='{cx}' cy='{cy}' r='{radius}' fill='none' stroke='{SPINE}'/>")
+    if labels:
+        points = " ".join(point(a, radius * max(0.0, min(1.0, v))) for a, v in zip(angles, values))
+        body.append(f"<polygon points='{points}' fill='{ACCENT}' fill-opacity='0.25' stroke='{ACCENT}' stroke-width='2'/>")
+    return _svg(size, size + 20, body, "Category radar chart")
+
+
+def svg_criteria_bar_chart(result: Dict) -> str:
+    codes = list(result["criteria_meta"].keys())
+    scores = [result["criteria_scores"].get(code, 0) for code in codes]
+    width, height = 640, 600
+    left, right, top, bottom = 48, 20, 36, 48
+    plot_w, plot_h = width - left - right, height - top - bottom
+    x_max = 4.2
+
+    def x(v: float) -> float:
+        return left + (max(0.0, min(v, x_max)) / x_max) * plot_w
+
+    body: List[str] = [_text(width / 2, 22, "20-Criteria Checklist Scores", size=14)]
+    for tick in range(5):
+        body.append(f"<line x1='{x(tick):.1f}' x2='{x(tick):.1f}' y1='{top}' y2='{top + plot_h}' stroke='{GRID}' stroke-dasharray='4 3'/>")
+        body.append(_text(x(tick), top + plot_h + 16, str(tick), size=11))
+    row_h = plot_h / max(len(codes), 1)
+    for idx, (code, score) in enumerate(zip(codes, scores)):
+        shade = lerp_hex(CRITERIA_LIGHT, CRITERIA_DARK, idx / max(len(codes) - 1, 1))
+        y0 = top + row_h * idx
+        body.append(f"<rect x='{left}' y='{y0 + row_h * 0.1:.1f}' width='{x(score) - left:.1f}' height='{row_h * 0.8:.1f}' fill='{shade}'/>")
+        body.append(_text(left - 6, y0 + row_h / 2 + 4, code, size=11, anchor="end"))
+    body.append(f"<rect x='{left}' y='{top}' width='{plot_w}' height='{plot_h}' fill='none' stroke='{SPINE}'/>")
+    body.append(_text(left + plot_w / 2, height - 10, "Score (0-4)", size=11, fill=MUTED))
+    return _svg(width, height, body, "Criteria bar chart")
+
+
+def generate_svg_charts(result: Dict) -> Dict[str, str]:
+    """Inline SVG versions of the result report charts, drawn directly from the score data."""
+    return {
+        "categories_bar": svg_category_bar_chart(result),
+        "categories_radar": svg_category_radar_chart(result),
+        "criteria_bar": svg_criteria_bar_chart(result),
+    }
+
+
+__all__ = ["generate_svg_charts", "svg_category_bar_chart", "svg_category_radar_chart", "svg_criteria_bar_chart"]
@@ -2,10 +2,16 @@ from __future__ import annotations
 
 import itertools
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from llm_adapter import LLMNotConfigured, llm_generate_questions
+import numpy as np
+
+from item_bank import ItemBank, item_fingerprint
+from llm_adapter import LLMDeadlinePassed, LLMNotConfigured, llm_generate_questions, llm_generate_sections
+from similarity_index import NearDuplicateIndex
 
 # 기본 레벨 설정: 시험 시간과 권장 문항 수
 LEVEL_CONFIG: Dict[str, Dict[str, int]] = {
@@ -24,6 +30,9 @@ SECTION_LABELS = {
     "writing": ("W", "Part 5: Writing"),
 }
 
+# deadline 중 문항 선별·템플릿 채우기·렌더링을 위해 남겨 두는 비율(나머지가 LLM 예산)
+DEADLINE_RESERVE = 0.1
+
 # 간단한 섹션별 지문/문장 템플릿
 SECTION_STEMS = {
     "reading": "Read the short passage and choose the best answer.",
@@ -60,6 +69,42 @@ def _writing_prompt(level: str) -> str:
     )
 
 
+def _screen_items(
+    items: List[Dict],
+    index: NearDuplicateIndex,
+    form: Dict,
+    overlap: Dict[str, int],
+    limit: int,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    유사 문항 색인으로 후보 문항을 거른다. 같은 시험지 안의 유사 문항은 항상 제외하고,
+    이전 시험지와 겹치는 문항은 overlap["budget"]까지만 허용한다. limit개가 채워지면 나머지 후보는 보지 않는다.
+    (통과 문항, 제외 문항)을 반환한다. 통과 문항의 MinHash 서명은 form["signatures"][:form["count"]]
+    (시험지 문항 수만큼 미리 잡아 둔 배열)에 쌓고, 통과 문항은 곧바로 색인에 추가한다.
+    호출하는 쪽이 index.screen_lock을 잡고 있어야 동시에 만드는 시험지끼리도 서로의 문항을 본다.
+    """
+    accepted: List[Dict] = []
+    rejected: List[Dict] = []
+    for item in items:
+        if len(accepted) >= limit:
+            break
+        sig = index.signature(item)
+        seen = form["signatures"][: form["count"]]
+        if len(seen) and (seen == sig).mean(axis=1).max() >= index.threshold:
+            rejected.append(item)
+            continue
+        if index.query(item, signature=sig):
+            if overlap["used"] >= overlap["budget"]:
+                rejected.append(item)
+                continue
+            overlap["used"] += 1
+        form["signatures"][form["count"]] = sig
+        form["count"] += 1
+        index.add(item_fingerprint(item), item, signature=sig)
+        accepted.append(item)
+    return accepted, rejected
+
+
 def generate_test_data(
     level: str,
     question_counts: Optional[Dict[str, int]] = None,
@@ -67,11 +112,36 @@ def generate_test_data(
     llm_provider: str = "openai",
     llm_model: Optional[str] = None,
     context: Optional[str] = None,
+    use_llm_cache: bool = True,
+    item_bank: Optional[ItemBank] = None,
+    bank_exclude: Optional[Iterable[int]] = None,
+    bank_max_uses: Optional[int] = None,
+    similarity_index: Optional[NearDuplicateIndex] = None,
+    max_overlap: float = 0.0,
+    llm_mode: str = "per_section",
+    llm_fallbacks: Optional[List[str]] = None,
+    deadline: Optional[float] = None,
+    llm_hedge: Optional[str] = None,
 ) -> Dict:
     """
     레벨별 시험 데이터를 생성한다.
     반환 값은 HTML/결과 생성에 바로 사용할 수 있는 구조화된 dict이다.
+    use_llm_cache=False이면 LLM 응답 캐시를 건너뛰고 항상 새로 요청한다.
+    item_bank가 있으면 문항 은행에서 먼저 뽑고(bank_exclude의 문항 ID, bank_max_uses회 이상 쓰인 문항 제외),
+    모자란 만큼만 LLM 또는 템플릿으로 만든다. 새로 만든 LLM 문항은 은행에 추가된다.
+    similarity_index가 있으면 은행/LLM 문항 중 시험지 안에서 서로 비슷한 문항은 빼고, 색인에 있는 이전 시험지
+    문항과 비슷한 문항은 객관식 문항 수의 max_overlap 비율까지만 허용한다. 채택된 문항은 색인에 추가된다.
+    llm_mode="combined"이면 네 섹션을 요청 하나로 받아 섹션별로 나눈다(기본 "per_section"은 섹션마다 동시 요청).
+    llm_fallbacks("provider" 또는 "provider:model" 목록)는 기본 제공자가 실패하거나 회로 차단기가 열려 있을 때
+    차례로 시도하고, 모두 안 되면 템플릿으로 채운다. 차단기가 열린 제공자에는 요청하지 않는다.
+    deadline(초)을 주면 그 시간 안에 반환한다. 기한까지 LLM 응답이 오지 않은 섹션은 기다리지 않고
+    (은행에서 뽑은 문항 외의 나머지를) 템플릿으로 채우며, metadata.llm.timed_out에 기록한다.
+    llm_hedge("auto", "provider" 또는 "provider:model")를 주면 응답이 늦은 요청을 그 제공자에도 보내고 먼저 온
+    유효한 응답을 쓴다(llm_adapter의 hedge 참고).
     """
+    expires = time.monotonic() + deadline if deadline is not None else None
+    if llm_mode not in ("per_section", "combined"):
+        raise ValueError(f"Unknown llm_mode: {llm_mode}")
     if level not in LEVEL_CONFIG:
         raise ValueError(f"Unknown level: {level}")
 
@@ -83,41 +153,147 @@ def generate_test_data(
     answer_key: Dict[str, str] = {}
     total_questions = 0
 
-    llm_status = {"enabled": use_llm, "provider": llm_provider, "model": llm_model, "fallback": False, "error": ""}
+    llm_status = {"enabled": use_llm, "provider": llm_provider, "model": llm_model, "mode": llm_mode, "fallback": False, "error": "", "deadline": deadline}
 
-    for section in ["reading", "vocabulary", "conversation", "grammar"]:
-        prefix, title = SECTION_LABELS[section]
-        count = config[section]
-        questions = []
+    objective_sections = ["reading", "vocabulary", "conversation", "grammar"]
+    bank_items: Dict[str, List[Dict]] = {section: [] for section in objective_sections}
+    if item_bank is not None:
+        excluded = set(bank_exclude or ())
+        for section in objective_sections:
+            bank_items[section] = item_bank.sample(level, section, config[section], exclude_ids=excluded, max_uses=bank_max_uses, mark_used=False)
+    shortfall = {section: config[section] - len(bank_items[section]) for section in objective_sections}
 
-        llm_items: List[Dict] = []
-        if use_llm:
+    llm_results: Dict[str, List[Dict]] = {}
+    served_by: Dict[str, str] = {}  # 섹션별로 실제 응답한 "provider/model"
+    llm_sections = [section for section in objective_sections if shortfall[section] > 0]
+    if use_llm and llm_sections:
+        llm_stats: Dict[str, Dict] = {}
+        # LLM에 쓸 수 있는 시간: 남은 시간에서 템플릿 채우기·렌더링 몫을 뺀 만큼. 섹션 요청은 동시에 돌므로
+        # 섹션마다 이 시간이 각자의 예산이 되고, 재요청도 그 안에서만 한다.
+        budget = None if expires is None else max(0.0, (expires - time.monotonic()) * (1 - DEADLINE_RESERVE))
+        pool = ThreadPoolExecutor(max_workers=len(llm_sections), thread_name_prefix="llm-section")
+        if llm_mode == "combined":
+            key = "+".join(llm_sections)
+            futures = {
+                key: pool.submit(
+                    llm_generate_sections,
+                    llm_provider,
+                    level,
+                    {section: shortfall[section] for section in llm_sections},
+                    model=llm_model,
+                    context=context,
+                    use_cache=use_llm_cache,
+                    stats=llm_stats.setdefault(key, {}),
+                    fallbacks=llm_fallbacks,
+                    deadline=budget,
+                    hedge=llm_hedge,
+                )
+            }
+        else:
+            # 섹션들을 동시에 요청한다. 제공자별 동시 요청 수는 llm_adapter의 LLM_CONCURRENCY가 제한한다.
+            futures = {
+                section: pool.submit(
+                    llm_generate_questions,
+                    llm_provider,
+                    level,
+                    section,
+                    shortfall[section],
+                    model=llm_model,
+                    context=context,
+                    use_cache=use_llm_cache,
+                    stats=llm_stats.setdefault(section, {}),
+                    fallbacks=llm_fallbacks,
+                    deadline=budget,
+                    hedge=llm_hedge,
+                )
+                for section in llm_sections
+            }
+        done, _ = wait(futures.values(), timeout=budget)
+        # 기한 안에 끝나지 않은 요청은 기다리지 않는다. 스레드는 자기 예산이 다하면 곧 끝나고 결과는 버려진다.
+        pool.shutdown(wait=False, cancel_futures=True)
+        timed_out: List[str] = []
+        for key, future in futures.items():
             try:
-                llm_items = llm_generate_questions(llm_provider, level, section, count, model=llm_model, context=context)
+                if future not in done:
+                    raise LLMDeadlinePassed(f"deadline of {deadline:g}s exceeded")
+                result = future.result()
+            except LLMDeadlinePassed as exc:
+                timed_out += key.split("+")
+                llm_status["fallback"] = True
+                llm_status["error"] = str(exc)
+                continue
             except (LLMNotConfigured, Exception) as exc:  # fallback to templates on any failure
                 llm_status["fallback"] = True
                 llm_status["error"] = str(exc)
-                llm_items = []
-
-        if llm_items:
-            for idx, item in enumerate(llm_items[:count]):
-                qid = f"{prefix}{idx + 1}"
-                questions.append(
-                    {
-                        "id": qid,
-                        "text": item.get("text", ""),
-                        "options": item.get("options", []),
-                        "correct": item.get("correct", "A"),
-                        "section": section,
-                    }
-                )
-                answer_key[qid] = item.get("correct", "A")
-        else:
-            for idx in range(count):
-                text, options, correct = _question_text(section, level, idx)
-                qid = f"{prefix}{idx + 1}"
-                questions.append({"id": qid, "text": text, "options": options, "correct": correct, "section": section})
-                answer_key[qid] = correct
+                continue
+            llm_results.update(result if llm_mode == "combined" else {key: result})
+        # 기한 안에 끝나지 않아 템플릿으로 채운 섹션
+        llm_status["timed_out"] = timed_out
+        # 스키마 검증에 실패한 문항 수와, 그 문항만 다시 요청한 횟수
+        llm_status["invalid_items"] = sum(stats.get("invalid", 0) for stats in llm_stats.values())
+        llm_status["repair_requests"] = sum(stats.get("repairs", 0) for stats in llm_stats.values())
+        served_by = {section: stats["provider"] for key, stats in llm_stats.items() if "provider" in stats for section in key.split("+") if section in llm_results}
+
+    llm_status["served_by"] = served_by
+    candidates = {section: bank_items[section] + llm_results.get(section, [])[: shortfall[section]] for section in objective_sections}
+    duplicates = {"rejected": 0, "used": 0, "budget": 0}
+    if similarity_index is not None:
+        objective_total = sum(config[section] for section in objective_sections)
+        duplicates["budget"] = int(max_overlap * objective_total)
+        form = {"signatures": np.empty((objective_total, similarity_index.num_perm), dtype=np.uint32), "count": 0}
+        drawn_ids = {item["item_id"] for items in bank_items.values() for item in items}
+        # 검사와 색인 추가를 한 번에 한다: 병렬로 만드는 변형 시험지들이 같은 색인 상태를 보고 서로 겹치지 않게.
+        with similarity_index.screen_lock:
+            for section in objective_sections:
+                accepted, rejected = _screen_items(candidates[section], similarity_index, form, duplicates, config[section])
+                gap = config[section] - len(accepted)
+                if rejected and gap > 0 and item_bank is not None:
+                    # 제외된 만큼 은행에서 한 번 더 뽑아 본다.
+                    extra = item_bank.sample(
+                        level, section, gap, exclude_ids=drawn_ids | set(bank_exclude or ()), max_uses=bank_max_uses, mark_used=False
+                    )
+                    drawn_ids.update(item["item_id"] for item in extra)
+                    more, more_rejected = _screen_items(extra, similarity_index, form, duplicates, gap)
+                    accepted += more
+                    rejected += more_rejected
+                duplicates["rejected"] += len(rejected)
+                candidates[section] = accepted
+
+    if item_bank is not None:
+        # 뽑은 문항 중 유사 문항 검사에서 빠지거나 문항 수를 넘어 잘린 것은 사용 횟수에 넣지 않는다.
+        placed = [item["item_id"] for section in objective_sections for item in candidates[section][: config[section]] if item.get("item_id") is not None]
+        item_bank.mark_used(placed)
+        for section in objective_sections:
+            fresh = [item for item in candidates[section][: config[section]] if item.get("item_id") is None]
+            if fresh:
+                item_bank.add_items(level, section, fresh, source=f"llm:{served_by.get(section, llm_provider).split('/')[0]}", used=True)
+
+    for section in objective_sections:
+        prefix, title = SECTION_LABELS[section]
+        count = config[section]
+        questions = []
+
+        items: List[Dict] = candidates[section][:count]
+        for idx, item in enumerate(items):
+            qid = f"{prefix}{idx + 1}"
+            question = {
+                "id": qid,
+                "text": item.get("text", ""),
+                "options": item.get("options", []),
+                "correct": item.get("correct", "A"),
+                "criterion": item.get("criterion", ""),
+                "section": section,
+            }
+            if item.get("item_id") is not None:
+                question["item_id"] = item["item_id"]
+            questions.append(question)
+            answer_key[qid] = item.get("correct", "A")
+        # 은행/LLM 문항이 모자라면 나머지는 템플릿으로 채운다.
+        for idx in range(len(items), count):
+            text, options, correct = _question_text(section, level, idx)
+            qid = f"{prefix}{idx + 1}"
+            questions.append({"id": qid, "text": text, "options": options, "correct": correct, "section": section})
+            answer_key[qid] = correct
 
         sections[section] = {"title": title, "questions": questions}
         total_questions += count
@@ -138,6 +314,19 @@ def generate_test_data(
         "total_questions": total_questions,
         "llm": llm_status,
     }
+    if item_bank is not None:
+        metadata["item_bank"] = {
+            "path": str(item_bank.path),
+            "drawn": sum(len(items) for items in bank_items.values()),
+            "generated": sum(min(len(items), shortfall[section]) for section, items in llm_results.items()),
+        }
+    if similarity_index is not None:
+        metadata["near_duplicates"] = {
+            "threshold": similarity_index.threshold,
+            "max_overlap": max_overlap,
+            "overlapping": duplicates["used"],
+            "rejected": duplicates["rejected"],
+        }
 
     return {"metadata": metadata, "sections": sections, "answer_key": answer_key}
 
@@ -0,0 +1,73 @@
+"""벡터화 일괄 채점(AnswerKey.score / evaluate_batch)이 학생별 score_test와 같은 점수를 내는지 확인한다."""
+
+import numpy as np
+import pytest
+
+from grading import OPTION_LABELS, AnswerKey, encode_responses
+from main import CEFRTestSystem
+from rubric_system import CATEGORY_CRITERIA, WRITING_CRITERIA
+
+QUESTIONS_PER_SECTION = {"reading": 6, "vocabulary": 4, "grammar": 5, "conversation": 3}
+
+
+def _correct_answers(rng):
+    answers = {}
+    for cat, (prefix, _) in CATEGORY_CRITERIA.items():
+        for i in range(QUESTIONS_PER_SECTION[cat]):
+            answers[f"{prefix}{i + 1}"] = OPTION_LABELS[rng.integers(len(OPTION_LABELS))]
+    return answers
+
+
+def _random_feedback(rng, n_students):
+    # 절반은 작문 피드백 없음(기본 중간값), 나머지는 기준별 0-4 점수
+    return [
+        {code: {"score": int(rng.integers(0, 5))} for code in WRITING_CRITERIA} if rng.random() < 0.5 else None
+        for _ in range(n_students)
+    ]
+
+
+def _assert_same_scores(system, batch, codes, question_ids, correct, feedback):
+    for row in range(codes.shape[0]):
+        # 범위 밖 코드와 -1(미응답)은 학생별 경로에서는 답하지 않은 문항이다.
+        answers = {q: OPTION_LABELS[c] for q, c in zip(question_ids, codes[row]) if 0 <= c < len(OPTION_LABELS)}
+        expected = system.score_test("B1", f"s{row}", answers, correct, llm_feedback=feedback[row])
+        assert batch["total_score"][row] == pytest.approx(expected["total_score"])
+        assert batch["determined_level"][row] == expected["determined_level"]
+        for cat, score in expected["category_scores"].items():
+            assert batch["category_scores"][cat][row] == pytest.approx(score)
+        for code, score in expected["criteria_scores"].items():
+            assert batch["criteria_scores"][code][row] == score
+
+
+def test_vectorized_scores_match_score_test_for_codes(tmp_path):
+    rng = np.random.default_rng(7)
+    correct = _correct_answers(rng)
+    question_ids = list(correct)
+    # -1: 미응답, 4와 255/256/-129: int8 범위를 넘는 값을 포함한 잘못된 코드
+    codes = rng.choice([-1, 0, 1, 2, 3, 4, 255, 256, -129], size=(300, len(question_ids)), p=[0.1, 0.2, 0.2, 0.2, 0.2, 0.04, 0.02, 0.02, 0.02])
+    feedback = _random_feedback(rng, len(codes))
+    system = CEFRTestSystem(output_dir=str(tmp_path))
+
+    batch = system.evaluate_batch("B1", codes, question_ids, correct, llm_feedback=feedback)
+
+    _assert_same_scores(system, batch, codes, question_ids, correct, feedback)
+
+
+def test_vectorized_scores_match_score_test_for_labels(tmp_path):
+    rng = np.random.default_rng(11)
+    correct = _correct_answers(rng)
+    question_ids = list(correct)
+    codes = rng.integers(-1, len(OPTION_LABELS), size=(200, len(question_ids)))
+    labels = np.where(codes >= 0, np.array(OPTION_LABELS)[codes.clip(0)], "")  # "" = 미응답
+    feedback = _random_feedback(rng, len(codes))
+    system = CEFRTestSystem(output_dir=str(tmp_path))
+
+    batch = AnswerKey(correct).score(labels, question_ids, llm_feedback=feedback)
+
+    _assert_same_scores(system, batch, codes, question_ids, correct, feedback)
+
+
+def test_encode_responses_rejects_out_of_range_codes_before_narrowing():
+    codes = encode_responses(np.array([[256, 1, -1, 3, 4, -255]]), OPTION_LABELS)
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [[-1, 1, -1, 3, -1, -1]]